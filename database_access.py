@@ -1,9 +1,18 @@
+import csv
+import io
+import os
 import sys
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
+from itertools import count
 
+import numpy as np
 import psycopg2 as pgsql
 from psycopg2 import sql
-from psycopg2.extras import DictCursor
+from psycopg2.extras import DictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 from config import get_config
 from setup_logger import get_logger
@@ -18,6 +27,90 @@ class Singleton(type):
         return cls._instances[cls]
 
 
+_pools = {}
+# Names of the statements prepared in each connection
+_prepared_statements = weakref.WeakKeyDictionary()
+# Suffixes of the server-side cursor names
+_stream_ids = count()
+
+
+@lru_cache(maxsize=None)
+def read_query(query_file):
+    """
+        Returns the text of the query file, each file is read once
+        Args:
+            query_file: str - path to the `.sql` file
+        Returns:
+            query: str
+    """
+    with open(query_file, encoding="utf-8") as f:
+        return f.read()
+
+
+def get_pool(config, pool_config):
+    """
+        Returns the connection pool for the database in the config.
+        Pools are shared between the tables and created once per process.
+        Args:
+            config: dict - secrets config (see `DB.__init__`)
+            pool_config: dict - `connection_pool` section of the db config
+        Returns:
+            pool: ThreadedConnectionPool
+    """
+    key = (os.getpid(), config["db_host"], config["db_name"], config["db_user"])
+    if key not in _pools:
+        _pools[key] = ThreadedConnectionPool(
+            pool_config.get("min_connections", 1),
+            pool_config.get("max_connections", 8),
+            host=config["db_host"],
+            database=config["db_name"],
+            user=config["db_user"],
+            password=config["db_password"],
+        )
+    return _pools[key]
+
+
+def close_pools():
+    """
+        Closes all connections of the current process
+    """
+    for key in [key for key in _pools if key[0] == os.getpid()]:
+        _pools.pop(key).closeall()
+
+
+@contextmanager
+def transaction(*dbs):
+    """
+        Runs `with db:` blocks of the provided tables on a single
+        connection and commits them at once.
+
+        Usage:
+            with transaction(game_info_db, build_order_db):
+                with game_info_db as db:
+                    ...
+                with build_order_db as db:
+                    ...
+        Args:
+            dbs: DB - table instances sharing the transaction
+    """
+    conn = dbs[0]._get_connection()
+    for db in dbs:
+        db._shared_conn = conn
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    else:
+        conn.commit()
+    finally:
+        for db in dbs:
+            db._shared_conn = None
+        # A lost connection is closed instead of returning to the pool
+        dbs[0]._release_connection(conn, close=bool(conn.closed))
+
+
 class DB(metaclass=Singleton):
     """
         Base class for accessing Postgres database.
@@ -26,6 +119,10 @@ class DB(metaclass=Singleton):
         to access another table you should recreate the class
         instance.
 
+        Connections are taken from a pool shared by all tables,
+        each `with db:` block is a transaction unless it runs
+        inside `transaction(...)`.
+
     """
     def __init__(self, config_path: str, db_return_type=None):
         """
@@ -37,17 +134,21 @@ class DB(metaclass=Singleton):
         self.config = get_config(config_path)
         self.db_return_type = db_return_type
         self.logger = get_logger(__name__)
+        self.pool_config = {}
+        self.stream_config = {}
+        self._compiled_queries = {}
+        self._shared_conn = None
+        self._owns_conn = True
+        self._depth = 0
 
     def __enter__(self):
-        self.conn = self._get_connection()
-        cur_factory = None
-        if self.db_return_type == "dict":
-            cur_factory = DictCursor
+        self._depth += 1
+        if self._depth > 1:
+            return self
+        self._owns_conn = self._shared_conn is None
+        self.conn = self._get_connection() if self._owns_conn else self._shared_conn
         try:
-            if cur_factory is not None:
-                self.cur = self.conn.cursor(cursor_factory=cur_factory)
-            else:
-                self.cur = self.conn.cursor()
+            self.cur = self._get_cursor()
         except (Exception, pgsql.DatabaseError) as error:
             print(f"Critical: {error}")
             self.logger.critical(error)
@@ -55,14 +156,19 @@ class DB(metaclass=Singleton):
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth > 0:
+            return
         self.cur.close()
-        if isinstance(exc_value, Exception):
-            self.conn.rollback()
-        else:
-            self.conn.commit()
+        if self._owns_conn:
+            if isinstance(exc_value, Exception):
+                self.conn.rollback()
+            else:
+                self.conn.commit()
         if exc_type:
             self.logger.error(f"{exc_type}: {exc_value}\n{traceback}")
-        self.conn.close()
+        if self._owns_conn:
+            self._release_connection(self.conn)
 
     @property
     def query(self):
@@ -70,19 +176,47 @@ class DB(metaclass=Singleton):
 
     @query.setter
     def query(self, query_file):
-        _query = open(query_file).read()
-        self._query = self._compose_query(_query)
+        key = (query_file, self.name)
+        if key not in self._compiled_queries:
+            _query = read_query(query_file)
+            self._compiled_queries[key] = self._compose_query(_query)
+        self._query = self._compiled_queries[key]
 
     def _get_connection(self):
-        return pgsql.connect(
-            host=self.config["db_host"],
-            database=self.config["db_name"],
-            user=self.config["db_user"],
-            password=self.config["db_password"],
-        )
+        return get_pool(self.config, self.pool_config).getconn()
+
+    def _release_connection(self, conn, close=False):
+        get_pool(self.config, self.pool_config).putconn(conn, close=close)
+
+    def _get_cursor(self):
+        if self.db_return_type == "dict":
+            return self.conn.cursor(cursor_factory=DictCursor)
+        return self.conn.cursor()
+
+    def _raise_in_transaction(self, error):
+        """
+            Inside of `transaction(...)` an error aborts the whole transaction,
+            it is raised instead of a local rollback or reconnect
+            and `transaction` rolls back the shared connection
+        """
+        if self._shared_conn is not None:
+            raise error
+
+    def _reconnect(self):
+        """
+            Replaces the broken connection with a new one from the pool
+        """
+        if self._owns_conn:
+            self._release_connection(self.conn, close=True)
+        self.conn = self._get_connection()
+        self.cur = self._get_cursor()
+        self._owns_conn = True
 
     def _set_attrs(self, config_path, db_name):
-        self.db_config = get_config(config_path)[db_name]
+        full_config = get_config(config_path)
+        self.db_config = full_config[db_name]
+        self.pool_config = full_config.get("connection_pool", {})
+        self.stream_config = full_config.get("streaming", {})
         self.name = self.db_config["table_name"]
 
     def _save_changes(self):
@@ -92,7 +226,7 @@ class DB(metaclass=Singleton):
             self.logger.critical(error)
             print(error)
             self.conn.rollback()
-        self.cur = self.conn.cursor()
+        self.cur = self._get_cursor()
         self.logger.info(f'manual commit at "{self.name}"')
 
     def _compose_query(self, query):
@@ -100,6 +234,20 @@ class DB(metaclass=Singleton):
             return sql.SQL(query).format(sql.Identifier(self.name))
         return sql.SQL(query)
 
+    def _compose_copy_query(self, columns):
+        """
+            Compose `COPY ... FROM STDIN` query for the provided columns
+            Args:
+                columns: list[str] - column names in the order of the values
+            Returns:
+                query: sql.Composed
+        """
+        template = read_query(self.db_config["copy_file"])
+        return sql.SQL(template).format(
+            sql.Identifier(self.name),
+            cols=sql.SQL(", ").join(sql.Identifier(col) for col in columns),
+        )
+
     def drop(self):
         """
             Drop table
@@ -115,22 +263,47 @@ class DB(metaclass=Singleton):
     def create_table(self, query=None):
         if query is None:
             query_path = self.db_config["create_table_file"]
-            query = open(query_path).read()
+            query = read_query(query_path)
         try:
             self.cur.execute(query)
         except pgsql.ProgrammingError as e:
             print(e)
             self.logger.error(e)
+            self._raise_in_transaction(e)
             self.conn.rollback()
         except pgsql.InterfaceError as e:
             print(e)
             self.logger.error(e)
-            self.conn = self._get_connection()
-            self.cur = self.conn.cursor()
+            self._raise_in_transaction(e)
+            self._reconnect()
         self.last_query = query
         self.logger.info(self.last_query)
         self._save_changes()
 
+    def create_indexes(self):
+        """
+            Creates secondary indexes of the table (`create_indexes_file`),
+            does nothing if the table has none
+        """
+        if "create_indexes_file" not in self.db_config:
+            return
+        self.query = self.db_config["create_indexes_file"]
+        self._exec_update(self.query, {})
+        self._save_changes()
+        self.logger.info(f'indexes of "{self.name}" created')
+
+    def drop_indexes(self):
+        """
+            Drops secondary indexes of the table (`drop_indexes_file`),
+            use before a bulk load and call `create_indexes` after it
+        """
+        if "drop_indexes_file" not in self.db_config:
+            return
+        self.query = self.db_config["drop_indexes_file"]
+        self._exec_update(self.query, {})
+        self._save_changes()
+        self.logger.info(f'indexes of "{self.name}" dropped')
+
     def exists(self):
         """
             Check if table exists.
@@ -147,15 +320,17 @@ class DB(metaclass=Singleton):
         except pgsql.ProgrammingError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             self.conn.rollback()
         except pgsql.InterfaceError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
-            self.conn = self._get_connection()
-            self.cur = self.conn.cursor()
+            self._raise_in_transaction(e)
+            self._reconnect()
         except Exception as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             sys.exit()
 
         self.logger.debug(self.last_query)
@@ -176,21 +351,74 @@ class DB(metaclass=Singleton):
         except pgsql.ProgrammingError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             self.conn.rollback()
         except pgsql.InterfaceError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
-            self.conn = self._get_connection()
-            self.cur = self.conn.cursor()
+            self._raise_in_transaction(e)
+            self._reconnect()
         except Exception as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             sys.exit()
         self.logger.debug(self.last_query)
         items = self.cur.fetchall()
         self.logger.debug(f"Output: {items[0] if items else items}...")
         return items
 
+    def _exec_query_stream(self, query, kwargs, itersize=None, batches=False):
+        """
+            Executes the query using a named server-side cursor and
+            yields rows lazily. Must be consumed inside of `with db:` block.
+            Args:
+                query: sql.Composed - select query
+                kwargs: dict - query parameters
+                itersize: int | None - rows fetched per round trip,
+                    defaults to `streaming.itersize` from the db config
+                batches: bool - yield lists of `itersize` rows
+        """
+        itersize = itersize or self.stream_config.get("itersize", 2000)
+        cursor_factory = DictCursor if self.db_return_type == "dict" else None
+        cur = self.conn.cursor(
+            name=f"{self.name}_stream_{next(_stream_ids)}",
+            cursor_factory=cursor_factory,
+        )
+        cur.itersize = itersize
+        query = self.cur.mogrify(query, kwargs)
+        self.last_query = query
+        try:
+            cur.execute(query)
+        except pgsql.ProgrammingError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self.conn.rollback()
+            return
+        except pgsql.InterfaceError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self._reconnect()
+            return
+        except Exception as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            sys.exit()
+        self.logger.debug(self.last_query)
+        try:
+            if batches:
+                rows = cur.fetchmany(itersize)
+                while rows:
+                    yield rows
+                    rows = cur.fetchmany(itersize)
+            else:
+                yield from cur
+        finally:
+            cur.close()
+
     def _exec_insert(self, query, kwargs):
         query = self.cur.mogrify(query, kwargs)
         self.last_query = query
@@ -199,20 +427,30 @@ class DB(metaclass=Singleton):
         except pgsql.ProgrammingError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             self.conn.rollback()
         except pgsql.InterfaceError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
-            self.conn = self._get_connection()
-            self.cur = self.conn.cursor()
+            self._raise_in_transaction(e)
+            self._reconnect()
         except Exception as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             sys.exit()
 
         self.logger.debug(self.last_query)
 
-    def _exec_update(self, query, kwargs):
+    def _exec_update(self, query, kwargs, raise_errors=False):
+        """
+            Executes the query without fetching rows
+            Args:
+                query: sql.Composed - query
+                kwargs: dict - query parameters
+                raise_errors: bool - raise Postgres errors after
+                    the rollback or reconnect instead of only logging them
+        """
         query = self.cur.mogrify(query, kwargs)
         self.last_query = query
         try:
@@ -220,17 +458,155 @@ class DB(metaclass=Singleton):
         except pgsql.ProgrammingError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self.conn.rollback()
+            if raise_errors:
+                raise
+        except pgsql.InterfaceError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self._reconnect()
+            if raise_errors:
+                raise
+        except Exception as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            sys.exit()
+
+    def _rows_to_csv(self, rows):
+        """
+            Returns rows as a CSV buffer for `_exec_copy`
+            Args:
+                rows: Iterable[Sequence] - row values, None is written as NULL
+        """
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        return buffer
+
+    def _array_to_csv(self, values):
+        """
+            Returns integer 2-D array as a CSV buffer for `_exec_copy`
+            Args:
+                values: np.ndarray - (rows, columns) array
+        """
+        buffer = io.StringIO()
+        np.savetxt(buffer, values, fmt="%d", delimiter=",")
+        buffer.seek(0)
+        return buffer
+
+    def _exec_copy(self, query, buffer):
+        """
+            Stream rows into the table using `COPY FROM STDIN`.
+            Errors are raised after the rollback or reconnect,
+            rows of a failed COPY are lost and the caller decides what to do.
+            Args:
+                query: sql.Composed - query from `_compose_copy_query`
+                buffer: io.StringIO - CSV data, see `_rows_to_csv`
+        """
+        query = query.as_string(self.conn)
+        self.last_query = query
+        try:
+            self.cur.copy_expert(query, buffer)
+        except pgsql.ProgrammingError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self.conn.rollback()
+            raise
+        except pgsql.InterfaceError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self._reconnect()
+            raise
+        except Exception as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self.conn.rollback()
+            raise
+
+        self.logger.debug(self.last_query)
+
+    def _exec_values(self, query, rows):
+        """
+            Executes the query for many rows using `execute_values`
+            Args:
+                query: str - query with a single `VALUES %s` placeholder
+                rows: list[Sequence] - row values
+        """
+        self.last_query = query
+        try:
+            execute_values(self.cur, query, rows)
+        except pgsql.ProgrammingError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             self.conn.rollback()
         except pgsql.InterfaceError as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
-            self.conn = self._get_connection()
-            self.cur = self.conn.cursor()
+            self._raise_in_transaction(e)
+            self._reconnect()
         except Exception as e:
             print(f"Error:{e} \nAT QUERY: '{query}'")
             self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
             sys.exit()
 
+        self.logger.debug(self.last_query)
+
+    def _exec_prepared(self, stmt_name, prepare_query, args, fetch=False):
+        """
+            Executes a server-side prepared statement.
+            The statement is prepared once per connection,
+            names missing from the cache are checked in `pg_prepared_statements`
+            Args:
+                stmt_name: str - statement name
+                prepare_query: sql.Composed - `PREPARE stmt_name AS ...` query
+                args: Sequence - statement parameters
+                fetch: bool - return one row
+            Returns:
+                out: tuple | DictRow | None
+        """
+        prepared = _prepared_statements.setdefault(self.conn, set())
+        query = sql.SQL("EXECUTE {} ({})").format(
+            sql.Identifier(stmt_name),
+            sql.SQL(", ").join(sql.Placeholder() * len(args)),
+        )
+        self.last_query = query
+        try:
+            if stmt_name not in prepared:
+                # After an error the statement may exist on the server
+                self.cur.execute(
+                    "SELECT 1 FROM pg_prepared_statements WHERE name = %s",
+                    (stmt_name,),
+                )
+                if self.cur.fetchone() is None:
+                    self.cur.execute(prepare_query)
+                prepared.add(stmt_name)
+            self.cur.execute(query, args)
+        except pgsql.ProgrammingError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            prepared.discard(stmt_name)
+            self._raise_in_transaction(e)
+            self.conn.rollback()
+            return None
+        except pgsql.InterfaceError as e:
+            print(f"Error:{e} \nAT QUERY: '{query}'")
+            self.logger.error(f"Error:{e} \nAT QUERY: '{query}'")
+            self._raise_in_transaction(e)
+            self._reconnect()
+            return None
+
+        if fetch:
+            return self.cur.fetchone()
+        return None
+
     def put(self, args):
         raise NotImplementedError
 
@@ -238,6 +614,25 @@ class DB(metaclass=Singleton):
         self.query = self.db_config["select_file"]
         return self._exec_query_many(self.query, {})
 
+    def iter_rows(self, itersize=None):
+        """
+            Streams all rows of the table, see `_exec_query_stream`
+            Args:
+                itersize: int | None - rows fetched per round trip
+        """
+        self.query = self.db_config["select_file"]
+        yield from self._exec_query_stream(self.query, {}, itersize)
+
+    def iter_batches(self, batch_size=None):
+        """
+            Streams all rows of the table as lists of rows,
+            see `_exec_query_stream`
+            Args:
+                batch_size: int | None - rows per batch
+        """
+        self.query = self.db_config["select_file"]
+        yield from self._exec_query_stream(self.query, {}, batch_size, batches=True)
+
 
 class GameInfo(DB):
     """
@@ -330,6 +725,23 @@ class GameInfo(DB):
             result_id = out[0] if out is not None else None
         return result_id if out is not None else None
 
+    def get_ingested_keys(self):
+        """
+            Returns keys of all the games in the table using one query
+            Returns:
+                games: dict - {(players_hash, timestamp_played): game_id}
+                paths: dict - {replay_path: game_id}
+        """
+        self.query = self.db_config["select_keys_file"]
+        out = self._exec_query_many(self.query, {})
+        games = {}
+        paths = {}
+        for game_id, players_hash, timestamp_played, replay_path in out:
+            games[(players_hash, int(timestamp_played.timestamp()))] = game_id
+            if replay_path is not None:
+                paths[replay_path] = game_id
+        return games, paths
+
     def get_players_info(self, game_id):
         """
             Return info about players (see "select_player" sql query)
@@ -342,6 +754,53 @@ class GameInfo(DB):
         out = self._exec_query_one(self.query, {"game_id": game_id})
         return out
 
+    def iter_ids(self, itersize=None):
+        """
+            Streams ids of all the games
+            Args:
+                itersize: int | None - rows fetched per round trip
+        """
+        self.query = self.db_config["select_ids_file"]
+        for row in self._exec_query_stream(self.query, {}, itersize):
+            yield row[0]
+
+    def iter_candidates(
+        self,
+        player_r,
+        enemy_r,
+        min_league,
+        include_unranked=True,
+        game_ids=None,
+        itersize=None,
+    ):
+        """
+            Streams players info of the games where one of the players
+            passes the race and league filters, ordered by game_id
+            Args:
+                player_r: str - player's game race
+                enemy_r: str - enemy's game race
+                min_league: int - filter out leagues below this val
+                include_unranked: bool - include league=0
+                game_ids: list[int] | None - check these games only
+                itersize: int | None - rows fetched per round trip
+            Yields:
+                row: tuple - game_id and players info (len = 8)
+        """
+        to_pass = {
+            "matchup": f"{player_r}v{enemy_r}",
+            "reverse_matchup": f"{enemy_r}v{player_r}",
+            "player": player_r,
+            "enemy": enemy_r,
+            "min_league": min_league,
+            "include_unranked": include_unranked,
+        }
+        if game_ids is None:
+            self.query = self.db_config["select_candidates_file"]
+        else:
+            self.query = self.db_config["select_candidates_where_ids_file"]
+            to_pass["game_ids"] = list(game_ids)
+        yield from self._exec_query_stream(self.query, to_pass, itersize)
+
     def delete_id(self, game_id):
         self.query = self.db_config["delete_id"]
         self._exec_update(self.query, {"game_id": game_id})
@@ -351,6 +810,24 @@ class PlayerInfo(DB):
     """
         This class grants access to the player_info table.
     """
+    race_columns = {
+        "z": "zerg_played",
+        "p": "protoss_played",
+        "t": "terran_played",
+    }
+    columns = (
+        "player_id",
+        "nickname",
+        "games_played",
+        "zerg_played",
+        "protoss_played",
+        "terran_played",
+        "wins",
+        "loses",
+        "most_played_race",
+        "highest_league",
+    )
+
     def __init__(self, secrets_path: str, db_config_path: str):
         super().__init__(secrets_path)
         self._set_attrs(db_config_path, "player_info")
@@ -363,59 +840,73 @@ class PlayerInfo(DB):
         league_int: int,
         is_win: bool,
     ):
-        get_args_dict = {
-            "games_played": 0,
-            "zerg_played": 0,
-            "protoss_played": 0,
-            "terran_played": 0,
-            "wins": 0,
-            "loses": 0,
-            "most_played_race": "z",
-            "highest_league": 0,
-        }
-        get_prev_query = open(self.db_config["preinsert_select_file"]).read()
-        pass_id = {"player_id": player_id}
-        query_result = self._exec_query_one(get_prev_query, pass_id)
-        val_exists = False
-        if query_result is not None:
-            val_exists = True
-            for i, key in enumerate(get_args_dict.keys()):
-                get_args_dict[key] = query_result[i]
-        get_args_dict["nickname"] = nickname
-        get_args_dict["player_id"] = player_id
-        get_args_dict["games_played"] += 1
-        if race.casefold() == "z":
-            get_args_dict["zerg_played"] += 1
-        elif race.casefold() == "p":
-            get_args_dict["protoss_played"] += 1
-        elif race.casefold() == "t":
-            get_args_dict["terran_played"] += 1
-        else:
-            raise ValueError(f'race value "{race}" is not in ["z", "p", "t"]')
+        self.put_many(
+            [
+                {
+                    "player_id": player_id,
+                    "nickname": nickname,
+                    "race": race,
+                    "league_int": league_int,
+                    "is_win": is_win,
+                }
+            ]
+        )
 
-        if is_win:
-            get_args_dict["wins"] += 1
-        else:
-            get_args_dict["loses"] += 1
+    @classmethod
+    def aggregate(cls, players):
+        """
+            Sums games of the same player, the result is the input
+            of the upsert query
+            Args:
+                players: list[dict] - arguments of `put`, one dict per
+                    player per game, the same player can occur many times
+            Returns:
+                rows: list[list] - one row per player in the order of `columns`
+        """
+        stats = {}
+        for player in players:
+            race = player["race"].casefold()
+            if race not in cls.race_columns:
+                raise ValueError(f'race value "{race}" is not in ["z", "p", "t"]')
+            player_stats = stats.setdefault(
+                player["player_id"],
+                {
+                    "player_id": player["player_id"],
+                    "games_played": 0,
+                    "zerg_played": 0,
+                    "protoss_played": 0,
+                    "terran_played": 0,
+                    "wins": 0,
+                    "loses": 0,
+                    "highest_league": 0,
+                },
+            )
+            player_stats["nickname"] = player["nickname"]
+            player_stats["games_played"] += 1
+            player_stats[cls.race_columns[race]] += 1
+            if player["is_win"]:
+                player_stats["wins"] += 1
+            else:
+                player_stats["loses"] += 1
+            player_stats["highest_league"] = max(
+                player_stats["highest_league"], player["league_int"]
+            )
 
-        race_plays = [
-            get_args_dict["zerg_played"],
-            get_args_dict["protoss_played"],
-            get_args_dict["terran_played"],
-        ]
-        get_args_dict["most_played_race"] = ["z", "p", "t"][
-            race_plays.index(max(race_plays))
-        ]
-        get_args_dict["highest_league"] = max(
-            get_args_dict["highest_league"], league_int
-        )
+        for player_stats in stats.values():
+            race_plays = [player_stats[col] for col in cls.race_columns.values()]
+            player_stats["most_played_race"] = list(cls.race_columns)[
+                race_plays.index(max(race_plays))
+            ]
+        return [[stat[col] for col in cls.columns] for stat in stats.values()]
 
-        if val_exists:
-            self.query = self.db_config["update_file"]
-            self._exec_update(self.query, get_args_dict)
-        else:
-            self.query = self.db_config["insert_file"]
-            self._exec_insert(self.query, get_args_dict)
+    def put_many(self, players):
+        """
+            Adds games of the players to their stats in one statement.
+            Args:
+                players: list[dict] - see `aggregate`
+        """
+        query = read_query(self.db_config["upsert_file"])
+        self._exec_values(query, self.aggregate(players))
 
 
 class MapInfo(DB):
@@ -433,31 +924,50 @@ class MapInfo(DB):
         matchup_type: str,
         game_date,
     ):
-        game_date = datetime.date(game_date)
-        get_args_dict = {
-            "map_hash": map_hash,
-            "map_name": map_name,
-            "matchup_type": matchup_type,
-            "first_game_date": datetime(2010, 1, 1).date(),
-        }
-        get_prev_query = open(self.db_config["preinsert_select_file"]).read()
-        pass_hash = {"map_hash": map_hash}
-        query_result = self._exec_query_one(get_prev_query, pass_hash)
-        val_exists = False
-        if query_result is not None:
-            val_exists = True
-            for i, key in enumerate(get_args_dict.keys()):
-                get_args_dict[key] = query_result[i]
-
-        first_date = get_args_dict["first_game_date"]
-        get_args_dict["first_game_date"] = max(game_date, first_date)
-
-        if val_exists:
-            self.query = self.db_config["update_file"]
-            self._exec_update(self.query, get_args_dict)
-        else:
-            self.query = self.db_config["insert_file"]
-            self._exec_insert(self.query, get_args_dict)
+        self.put_many(
+            [
+                {
+                    "map_hash": map_hash,
+                    "map_name": map_name,
+                    "matchup_type": matchup_type,
+                    "game_date": game_date,
+                }
+            ]
+        )
+
+    @staticmethod
+    def aggregate(maps):
+        """
+            Merges rows of the same map, the result is the input
+            of the upsert query
+            Args:
+                maps: list[dict] - arguments of `put`
+            Returns:
+                rows: list[list] - map_hash, map_name, matchup_type, date
+        """
+        rows = {}
+        for map_data in maps:
+            map_hash = map_data["map_hash"]
+            game_date = datetime.date(map_data["game_date"])
+            prev_date = datetime(2010, 1, 1).date()
+            if map_hash in rows:
+                prev_date = rows[map_hash][-1]
+            rows[map_hash] = [
+                map_hash,
+                map_data["map_name"],
+                map_data["matchup_type"],
+                max(game_date, prev_date),
+            ]
+        return list(rows.values())
+
+    def put_many(self, maps):
+        """
+            Upserts many maps in one statement.
+            Args:
+                maps: list[dict] - see `aggregate`
+        """
+        query = read_query(self.db_config["upsert_file"])
+        self._exec_values(query, self.aggregate(maps))
 
 
 class BuildOrder(DB):
@@ -467,11 +977,118 @@ class BuildOrder(DB):
     def __init__(self, secrets_path: str, db_config_path: str):
         super().__init__(secrets_path, db_return_type="dict")
         self._set_attrs(db_config_path, "build_order")
+        self.batch_size = self.db_config["copy_batch_size"]
+        self.use_prepared = self.db_config.get("prepared_statements", False)
+        self._columns = None
+
+    def create_table(self, query=None):
+        """
+            Creates the table, hash partitioned by game_id
+            if `partitions` > 0 in the db config.
+            An existing table is never repartitioned.
+        """
+        partitions = self.db_config.get("partitions", 0)
+        if query is not None or not partitions:
+            super().create_table(query)
+            return
+        # `CREATE TABLE IF NOT EXISTS` keeps an existing plain table as it is
+        query = read_query(self.db_config["create_table_file"]).rstrip().rstrip(";")
+        super().create_table(query + "\nPARTITION BY HASH (game_id);")
+        self.query = self.db_config["is_partitioned_file"]
+        if not self._exec_query_one(self.query, {"table_name": self.name})[0]:
+            msg = f'Table "{self.name}" exists and is not partitioned'
+            print(msg)
+            self.logger.warning(msg)
+            return
+        template = read_query(self.db_config["create_partition_file"])
+        for remainder in range(partitions):
+            query = sql.SQL(template).format(
+                partition=sql.Identifier(f"{self.name}_p{remainder}"),
+                table=sql.Identifier(self.name),
+                modulus=sql.Literal(partitions),
+                remainder=sql.Literal(remainder),
+            )
+            self._exec_update(query, {})
+        self._save_changes()
+        self.logger.info(f'"{self.name}" partitioned into {partitions} tables')
 
     def put(self, **col_data):
+        if self.use_prepared:
+            self._put_prepared(col_data)
+            return
         self.query = self.db_config["insert_file"]
         self._exec_insert(self.query, col_data)
 
+    def _put_prepared(self, col_data):
+        columns = self.get_table_columns()
+        stmt_name = f"{self.name}_insert"
+        key = (self.db_config["prepare_insert_file"], stmt_name)
+        if key not in self._compiled_queries:
+            template = read_query(self.db_config["prepare_insert_file"])
+            self._compiled_queries[key] = sql.SQL(template).format(
+                name=sql.Identifier(stmt_name),
+                table=sql.Identifier(self.name),
+                cols=sql.SQL(", ").join(sql.Identifier(col) for col in columns),
+                params=sql.SQL(", ").join(
+                    sql.SQL(f"${i}") for i in range(1, len(columns) + 1)
+                ),
+            )
+        args = [col_data.get(col) for col in columns]
+        self._exec_prepared(stmt_name, self._compiled_queries[key], args)
+
+    def get_table_columns(self):
+        """
+            Returns table's column names in their physical order.
+            The result is cached after the first call.
+        """
+        if self._columns is None:
+            self.query = self.db_config["get_table_columns_file"]
+            out = self._exec_query_many(self.query, {"table_name": self.name})
+            self._columns = [row[0] for row in out]
+        return self._columns
+
+    def put_many(self, rows, batch_size=None):
+        """
+            Uploads many rows at once using `COPY FROM STDIN`.
+            Missing columns are written as NULL.
+            Args:
+                rows: list[dict] - build_order rows (see `put`)
+                batch_size: int | None - rows per COPY statement,
+                    defaults to `copy_batch_size` from the db config
+        """
+        batch_size = batch_size or self.batch_size
+        columns = self.get_table_columns()
+        query = self._compose_copy_query(columns)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            buffer = self._rows_to_csv(
+                [row.get(col) for col in columns] for row in batch
+            )
+            self._exec_copy(query, buffer)
+        self.logger.info(f'{len(rows)} rows copied into "{self.name}"')
+
+    def put_array(self, columns, values, batch_size=None):
+        """
+            Uploads a 2-D integer array using `COPY FROM STDIN`.
+            Columns which are not in the table are skipped.
+            Args:
+                columns: list[str] - column name of each array column
+                values: np.ndarray - (rows, columns) array
+                batch_size: int | None - rows per COPY statement,
+                    defaults to `copy_batch_size` from the db config
+        """
+        batch_size = batch_size or self.batch_size
+        table_columns = set(self.get_table_columns())
+        positions = [i for i, col in enumerate(columns) if col in table_columns]
+        if len(positions) < len(columns):
+            values = values[:, positions]
+            columns = [columns[i] for i in positions]
+        query = self._compose_copy_query(columns)
+        for start in range(0, len(values), batch_size):
+            buffer = self._array_to_csv(values[start:start + batch_size])
+            self._exec_copy(query, buffer)
+        self.logger.info(f'{len(values)} rows copied into "{self.name}"')
+
     def get(self):
         self.query = self.db_config["select_file"]
         return self._exec_query_many(self.query, {})
@@ -485,6 +1102,18 @@ class BuildOrder(DB):
             Returns:
                 out: dict
         """
+        if self.use_prepared:
+            stmt_name = f"{self.name}_select_by_keys"
+            key = (self.db_config["prepare_select_by_keys"], stmt_name)
+            if key not in self._compiled_queries:
+                template = read_query(self.db_config["prepare_select_by_keys"])
+                self._compiled_queries[key] = sql.SQL(template).format(
+                    name=sql.Identifier(stmt_name),
+                    table=sql.Identifier(self.name),
+                )
+            return self._exec_prepared(
+                stmt_name, self._compiled_queries[key], (game_id, tick), fetch=True
+            )
         to_upload = {
             "game_id": game_id,
             "tick": tick,
@@ -492,6 +1121,257 @@ class BuildOrder(DB):
         self.query = self.db_config["select_by_keys"]
         return self._exec_query_one(self.query, to_upload)
 
+    def _compose_select_query(self, query_file, columns):
+        """
+            Compose select query returning only the provided columns.
+            Queries are cached by the column set.
+            Args:
+                query_file: str - query template with `{table}` and `{cols}`
+                columns: Sequence[str] - column names
+            Returns:
+                query: sql.Composed
+        """
+        key = (query_file, self.name, tuple(columns))
+        if key not in self._compiled_queries:
+            template = read_query(query_file)
+            self._compiled_queries[key] = sql.SQL(template).format(
+                table=sql.Identifier(self.name),
+                cols=sql.SQL(", ").join(sql.Identifier(col) for col in columns),
+            )
+        return self._compiled_queries[key]
+
+    def get_by_ticks(self, game_id, ticks, columns=None):
+        """
+            Gets build order of the game at many ticks in one query
+            Args:
+                game_id: int - game id
+                ticks: list[int] - game ticks
+                columns: Sequence[str] | None - select only these columns,
+                    all columns if None
+            Returns:
+                out: list[DictRow] - rows in any order
+        """
+        to_upload = {
+            "game_id": game_id,
+            "ticks": list(ticks),
+        }
+        if columns is not None:
+            query = self._compose_select_query(
+                self.db_config["select_cols_by_ticks"], columns
+            )
+            return self._exec_query_many(query, to_upload)
+        self.query = self.db_config["select_by_ticks"]
+        return self._exec_query_many(self.query, to_upload)
+
+    def get_by_game_ticks(self, keys, columns=None):
+        """
+            Gets build order rows of many games in one query
+            Args:
+                keys: list[tuple[int, int]] - (game_id, tick) pairs
+                columns: Sequence[str] | None - select only these columns,
+                    all columns if None
+            Returns:
+                out: list[DictRow] - rows in any order
+        """
+        to_upload = {
+            "game_ids": [game_id for game_id, _ in keys],
+            "ticks": [tick for _, tick in keys],
+        }
+        if columns is not None:
+            query = self._compose_select_query(
+                self.db_config["select_cols_by_game_ticks"], columns
+            )
+            return self._exec_query_many(query, to_upload)
+        self.query = self.db_config["select_by_game_ticks"]
+        return self._exec_query_many(self.query, to_upload)
+
+    def iter_game_ids(self):
+        """
+            Streams ids of the games in the table
+        """
+        self.query = self.db_config["select_ids_file"]
+        for row in self._exec_query_stream(self.query, {}):
+            yield row[0]
+
+    def get_games(self, game_ids):
+        """
+            Gets all rows of the games ordered by (game_id, tick)
+            Args:
+                game_ids: list[int] - game ids
+            Returns:
+                columns: tuple[str] - column names
+                rows: list[DictRow]
+        """
+        self.query = self.db_config["select_where_ids_file"]
+        out = self._exec_query_many(self.query, {"game_ids": list(game_ids)})
+        columns = tuple(col.name for col in self.cur.description)
+        return columns, out
+
+
+BUILD_ORDER_DTYPE = np.dtype("<i4")
+
+
+def pack_build_order(values):
+    """
+        Returns the (ticks, columns) build order array of a game as bytes
+    """
+    return np.ascontiguousarray(values, dtype=BUILD_ORDER_DTYPE).tobytes()
+
+
+def unpack_build_order(columns, data):
+    """
+        Inverse of `pack_build_order`
+        Returns:
+            columns: list[str] - column names, the first one is `tick`
+            values: np.ndarray - (ticks, columns) int32 array
+    """
+    values = np.frombuffer(bytes(data), dtype=BUILD_ORDER_DTYPE)
+    return list(columns), values.reshape(-1, len(columns))
+
+
+class PackedBuildOrderReader:
+    """
+        `BuildOrder` methods used by `Extractor` for the build orders
+        stored as one packed array per game.
+        Rows are dicts with `game_id`, `tick` and the game's columns.
+
+        Subclasses implement `get_games` and call `_clear_cache`
+        in `__init__` and after writes.
+    """
+
+    def _clear_cache(self):
+        # Build order of the last read game
+        self._cached = (None, None, None)
+
+    def get_games(self, game_ids):
+        """
+            Returns build order of the games
+            Args:
+                game_ids: list[int] - game ids
+            Returns:
+                games: dict - {game_id: (columns, values)}, columns start with `tick`
+        """
+        raise NotImplementedError
+
+    def get_game(self, game_id):
+        """
+            Returns build order of the game, see `get_games`
+        """
+        if self._cached[0] != game_id:
+            columns, values = self.get_games([game_id]).get(
+                game_id, (["tick"], np.empty((0, 1), dtype=BUILD_ORDER_DTYPE))
+            )
+            positions = {tick: i for i, tick in enumerate(values[:, 0].tolist())}
+            self._cached = (game_id, (columns, values), positions)
+        return self._cached[1], self._cached[2]
+
+    def get_table_columns(self):
+        """
+            Column sets differ between games, so there is no common
+            column list to select from. Returns None.
+        """
+        return None
+
+    def get_by_ticks(self, game_id, ticks, columns=None):
+        """
+            Gets build order rows of the game at the ticks
+            Args:
+                game_id: int - game id
+                ticks: list[int] - game ticks
+                columns: Sequence[str] | None - keep only these columns,
+                    the whole game is read anyway
+            Returns:
+                out: list[dict] - rows in any order, missing ticks are skipped
+        """
+        (game_columns, values), positions = self.get_game(game_id)
+        game_columns = ("game_id", *game_columns)
+        rows = []
+        for tick in set(ticks):
+            if tick in positions:
+                row = values[positions[tick]].tolist()
+                rows.append(dict(zip(game_columns, [game_id, *row])))
+        if columns is not None:
+            rows = [{col: row[col] for col in columns if col in row} for row in rows]
+        return rows
+
+    def get_by_keys(self, game_id, tick):
+        rows = self.get_by_ticks(game_id, [tick])
+        return rows[0] if rows else None
+
+    def get_by_game_ticks(self, keys, columns=None):
+        """
+            Gets build order rows of many games with one `get_games` call
+            Args:
+                keys: list[tuple[int, int]] - (game_id, tick) pairs
+                columns: Sequence[str] | None - keep only these columns
+            Returns:
+                out: list[dict] - rows in any order, missing ticks are skipped
+        """
+        by_game = {}
+        for game_id, tick in keys:
+            by_game.setdefault(game_id, set()).add(tick)
+        games = self.get_games(list(by_game))
+        rows = []
+        for game_id, (game_columns, values) in games.items():
+            game_columns = ("game_id", *game_columns)
+            for pos, tick in enumerate(values[:, 0].tolist()):
+                if tick in by_game[game_id]:
+                    row = values[pos].tolist()
+                    rows.append(dict(zip(game_columns, [game_id, *row])))
+        if columns is not None:
+            rows = [{col: row[col] for col in columns if col in row} for row in rows]
+        return rows
+
+
+class BuildOrderPacked(PackedBuildOrderReader, DB):
+    """
+        This class grants access to the build_order_packed table.
+
+        Stores one row per game: column names and an int32
+        (ticks, columns) array as bytes, the first column is `tick`.
+        Reads are done by `PackedBuildOrderReader`.
+    """
+
+    def __init__(self, secrets_path: str, db_config_path: str):
+        super().__init__(secrets_path)
+        self._set_attrs(db_config_path, "build_order_packed")
+        self._clear_cache()
+
+    def put_array(self, columns, values):
+        """
+            Uploads build order of one or many games,
+            games which are already in the table are replaced
+            Args:
+                columns: list[str] - column names, the first one is `game_id`
+                values: np.ndarray - (rows, columns) integer array
+        """
+        columns = list(columns[1:])
+        game_ids = values[:, 0]
+        rows = [
+            (
+                game_id,
+                columns,
+                pgsql.Binary(pack_build_order(values[game_ids == game_id, 1:])),
+            )
+            for game_id in np.unique(game_ids).tolist()
+        ]
+        self.query = self.db_config["upsert_file"]
+        self._exec_values(self.query, rows)
+        self._clear_cache()
+        self.logger.info(f'{len(values)} rows packed into "{self.name}"')
+
+    def get_games(self, game_ids):
+        self.query = self.db_config["select_games_file"]
+        out = self._exec_query_many(self.query, {"game_ids": list(game_ids)})
+        return {
+            game_id: unpack_build_order(columns, data)
+            for game_id, columns, data in out
+        }
+
+    def get_game_ids(self):
+        self.query = self.db_config["select_ids_file"]
+        return [row[0] for row in self._exec_query_many(self.query, {})]
+
 
 class MatchupDB(DB):
     """
@@ -502,6 +1382,8 @@ class MatchupDB(DB):
         self._set_attrs(db_config_path, "matchup_table")
         self.name = table_name
         self.table_created = False
+        self._insert_queries = {}
+        self.batch_size = self.db_config["copy_batch_size"]
 
     def change_table(self, table_name: str):
         """
@@ -529,9 +1411,7 @@ class MatchupDB(DB):
         query = ", ".join((f"{name} INTEGER" for name in input_entities.keys()))
         query += ", "
         query += ", ".join((f"{name} NUMERIC(4, 3)" for name in out_entities.keys()))
-        template_query = open(
-            self.db_config["create_table_file"], encoding="utf-8"
-        ).read()
+        template_query = read_query(self.db_config["create_table_file"])
         query = template_query.format(self.name, cols=query)
         return query
 
@@ -549,14 +1429,16 @@ class MatchupDB(DB):
                 query: str
         """
         entities = player_entities | enemy_entities | out_entities
+        key = (self.name, tuple(entities.keys()))
+        if key in self._insert_queries:
+            return self._insert_queries[key]
         input_query = ",\n".join((f"{name}" for name in entities.keys()))
         get_query = ",\n".join((f"%({name})s" for name in entities.keys()))
-        template_query = open(
-            self.db_config["insert_file"], encoding="utf-8"
-        ).read()
+        template_query = read_query(self.db_config["insert_file"])
         query = template_query.format(
             self.name, cols=input_query, formatted_cols=get_query
         )
+        self._insert_queries[key] = query
         return query
 
     def create_table(
@@ -587,6 +1469,53 @@ class MatchupDB(DB):
         key_dict = {"game_id": game_id, "tick": tick}
         self._exec_insert(query, key_dict | player_entities | enemy_entities | out_entities)
 
+    def _compose_staging_queries(self, columns):
+        """
+            Compose queries which copy rows into a temporary table
+            and move them into the table skipping the existing keys
+            Args:
+                columns: list[str] - column names in the order of the values
+            Returns:
+                create_query: sql.Composed
+                copy_query: sql.Composed
+                merge_query: sql.Composed
+        """
+        names = {
+            "table": sql.Identifier(self.name),
+            "staging": sql.Identifier(f"{self.name}_staging"),
+            "cols": sql.SQL(", ").join(sql.Identifier(col) for col in columns),
+        }
+        create_template = read_query(self.db_config["create_staging_file"])
+        copy_template = read_query(self.db_config["copy_file"])
+        merge_template = read_query(self.db_config["merge_staging_file"])
+        return (
+            sql.SQL(create_template).format(**names),
+            sql.SQL(copy_template).format(names["staging"], cols=names["cols"]),
+            sql.SQL(merge_template).format(**names),
+        )
+
+    def put_many(self, columns, rows, batch_size=None):
+        """
+            Uploads many rows at once using `COPY FROM STDIN`.
+            Rows are copied into a temporary table first, rows with
+            existing (game_id, tick) keys are skipped as in `put`.
+            The table must be created beforehand.
+            Args:
+                columns: list[str] - column names, starting with game_id and tick
+                rows: list[Sequence] - row values in the order of `columns`
+                batch_size: int | None - rows per COPY statement,
+                    defaults to `copy_batch_size` from the db config
+        """
+        batch_size = batch_size or self.batch_size
+        create_query, copy_query, merge_query = self._compose_staging_queries(columns)
+        # A failed statement raises, so `Loader` keeps the rows unflushed
+        self._exec_update(create_query, {}, raise_errors=True)
+        for start in range(0, len(rows), batch_size):
+            buffer = self._rows_to_csv(rows[start:start + batch_size])
+            self._exec_copy(copy_query, buffer)
+            self._exec_update(merge_query, {}, raise_errors=True)
+        self.logger.info(f'{len(rows)} rows copied into "{self.name}"')
+
     def get_id(self, game_id):
         """
             Gets all the data in the current game_id
@@ -597,6 +1526,56 @@ class MatchupDB(DB):
         self.query = self.db_config["select_where_id"]
         return self._exec_query_many(self.query, to_pass)
 
+    def get_keys(self, game_ids=None):
+        """
+            Gets primary keys of the table
+            Args:
+                game_ids: list[int] | None - return keys of these games only
+            Returns:
+                out: list[DictRow] - (game_id, tick) rows
+        """
+        if game_ids is None:
+            self.query = self.db_config["select_keys_file"]
+            return self._exec_query_many(self.query, {})
+        self.query = self.db_config["select_keys_where_ids_file"]
+        return self._exec_query_many(self.query, {"game_ids": list(game_ids)})
+
+    def get_table_columns(self):
+        """
+            Returns current table's column names in their physical order
+        """
+        self.query = self.db_config["get_table_columns_file"]
+        out = self._exec_query_many(self.query, {"table_name": self.name})
+        return [row[0] for row in out]
+
+    def count_range(self, min_id=None, max_id=None):
+        """
+            Counts rows with min_id <= game_id < max_id
+            Args:
+                min_id: int | None - no lower bound if None
+                max_id: int | None - no upper bound if None
+        """
+        self.query = self.db_config["count_range_file"]
+        out = self._exec_query_one(self.query, {"min_id": min_id, "max_id": max_id})
+        return out[0]
+
+    def iter_range(self, min_id=None, max_id=None, batch_size=None):
+        """
+            Streams lists of rows with min_id <= game_id < max_id
+            ordered by (game_id, tick), see `_exec_query_stream`
+            Args:
+                min_id: int | None - no lower bound if None
+                max_id: int | None - no upper bound if None
+                batch_size: int | None - rows per batch
+        """
+        self.query = self.db_config["select_range_file"]
+        yield from self._exec_query_stream(
+            self.query,
+            {"min_id": min_id, "max_id": max_id},
+            batch_size,
+            batches=True,
+        )
+
     def get_by_key(self, game_id, tick):
         """
             Get data by the primary key
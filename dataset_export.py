@@ -0,0 +1,234 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from database_access import MatchupDB
+from setup_logger import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def load_npy(out_dir, mmap_mode="r"):
+    """
+        Loads the dataset exported with the `npy` format
+        Args:
+            out_dir: str | Path - export directory
+            mmap_mode: str | None - see `np.load`, "r" maps the files read-only
+        Returns:
+            keys: np.ndarray - (rows, 2) int32 array of game_id, tick
+            features: np.ndarray - (rows, features) float32 array
+            labels: np.ndarray - (rows, labels) float32 array
+            manifest: dict - content of manifest.json
+    """
+    out_dir = Path(out_dir)
+    with open(out_dir / "manifest.json") as f:
+        manifest = json.load(f)
+    rows = manifest["rows"]
+    files = manifest["files"]
+    keys = np.load(out_dir / files["keys"], mmap_mode=mmap_mode)[:rows]
+    features = np.load(out_dir / files["features"], mmap_mode=mmap_mode)[:rows]
+    labels = np.load(out_dir / files["labels"], mmap_mode=mmap_mode)[:rows]
+    return keys, features, labels, manifest
+
+
+class DatasetExporter:
+    """
+        Exports a dataset table (`(matchup)_comp`, `_winprob`, `_enemycomp`)
+        into files for training. Rows are streamed from the DB in batches
+        and ordered by (game_id, tick).
+
+        Formats:
+            `npy` - keys.npy, features.npy and labels.npy written
+                    through `np.lib.format.open_memmap`
+            `parquet` - Parquet file, one row group per batch (requires pyarrow)
+            `arrow` - Arrow IPC file, one record batch per batch (requires pyarrow)
+
+        Every format writes manifest.json with the column names.
+        Features are `p_*` and `e_*` columns, labels are `out_*` columns.
+    """
+    formats = ("npy", "parquet", "arrow")
+    key_columns = ["game_id", "tick"]
+    label_prefix = "out_"
+
+    def __init__(
+        self, table_name, secrets_path, db_config_path, batch_size=None
+    ) -> None:
+        """
+            Args:
+                table_name: str - dataset table, e.g. "zvt_comp"
+                secrets_path: str - path to secrets file
+                db_config_path: str - path to db config
+                batch_size: int | None - rows per batch, defaults to
+                    `streaming.itersize` from the db config
+        """
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.db = MatchupDB(table_name, secrets_path, db_config_path)
+        self.logger = get_logger(__name__)
+
+    def split_columns(self, columns):
+        """
+            Splits table columns into keys, features and labels
+            Args:
+                columns: list[str] - table columns
+            Returns:
+                features: list[str]
+                labels: list[str]
+        """
+        features = [
+            col
+            for col in columns
+            if col not in self.key_columns and not col.startswith(self.label_prefix)
+        ]
+        labels = [col for col in columns if col.startswith(self.label_prefix)]
+        return features, labels
+
+    def _get_positions(self, columns):
+        features, labels = self.split_columns(columns)
+        positions = {col: i for i, col in enumerate(columns)}
+        return (
+            [positions[col] for col in self.key_columns],
+            [positions[col] for col in features],
+            [positions[col] for col in labels],
+        )
+
+    def _to_float(self, values):
+        values = values.copy()
+        values[np.equal(values, None)] = np.nan
+        return values.astype(np.float32)
+
+    def _write_manifest(self, out_dir, manifest):
+        with open(out_dir / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+
+    def export(self, out_dir, fmt="npy", min_id=None, max_id=None):
+        """
+            Exports rows with min_id <= game_id < max_id
+            Args:
+                out_dir: str | Path - output directory, created if missing
+                fmt: str - one of `formats`
+                min_id: int | None - no lower bound if None
+                max_id: int | None - no upper bound if None
+            Returns:
+                manifest: dict - content of manifest.json
+        """
+        if fmt not in self.formats:
+            raise ValueError(f"Unknown format '{fmt}', use one of {self.formats}")
+        if fmt != "npy" and pa is None:
+            raise ImportError(f"pyarrow is required for the '{fmt}' format")
+
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        self.db.change_table(self.table_name)
+        with self.db as db:
+            columns = db.get_table_columns()
+            if not columns:
+                raise ValueError(f"Table '{self.table_name}' doesn't exist")
+            batches = db.iter_range(min_id, max_id, self.batch_size)
+            if fmt == "npy":
+                total = db.count_range(min_id, max_id)
+                rows, files = self._export_npy(out_dir, columns, batches, total)
+            else:
+                rows, files = self._export_arrow(out_dir, columns, batches, fmt)
+
+        features, labels = self.split_columns(columns)
+        manifest = {
+            "table": self.table_name,
+            "format": fmt,
+            "rows": rows,
+            "min_id": min_id,
+            "max_id": max_id,
+            "key_columns": self.key_columns,
+            "feature_columns": features,
+            "label_columns": labels,
+            "files": files,
+        }
+        self._write_manifest(out_dir, manifest)
+        self.logger.info(f'{rows} rows of "{self.table_name}" exported to {out_dir}')
+        return manifest
+
+    def _export_npy(self, out_dir, columns, batches, total):
+        key_pos, feature_pos, label_pos = self._get_positions(columns)
+        files = {
+            "keys": "keys.npy",
+            "features": "features.npy",
+            "labels": "labels.npy",
+        }
+        keys = np.lib.format.open_memmap(
+            out_dir / files["keys"], mode="w+", dtype=np.int32,
+            shape=(total, len(key_pos)),
+        )
+        features = np.lib.format.open_memmap(
+            out_dir / files["features"], mode="w+", dtype=np.float32,
+            shape=(total, len(feature_pos)),
+        )
+        labels = np.lib.format.open_memmap(
+            out_dir / files["labels"], mode="w+", dtype=np.float32,
+            shape=(total, len(label_pos)),
+        )
+        rows = 0
+        for batch in batches:
+            # Rows inserted after the count are left for the next export
+            batch = batch[: total - rows]
+            if not batch:
+                break
+            values = np.array(batch, dtype=object)
+            end = rows + len(batch)
+            keys[rows:end] = values[:, key_pos].astype(np.int32)
+            features[rows:end] = self._to_float(values[:, feature_pos])
+            labels[rows:end] = self._to_float(values[:, label_pos])
+            rows = end
+        for array in (keys, features, labels):
+            array.flush()
+        return rows, files
+
+    def _get_schema(self, columns):
+        _, labels = self.split_columns(columns)
+        return pa.schema(
+            [
+                (col, pa.float32() if col in labels else pa.int32())
+                for col in columns
+            ]
+        )
+
+    def _to_record_batch(self, batch, columns, schema):
+        arrays = []
+        for col, values in zip(columns, zip(*batch)):
+            if col.startswith(self.label_prefix):
+                values = [float(val) if val is not None else None for val in values]
+            arrays.append(pa.array(values, type=schema.field(col).type))
+        return pa.record_batch(arrays, schema=schema)
+
+    def _export_arrow(self, out_dir, columns, batches, fmt):
+        schema = self._get_schema(columns)
+        file_name = f"{self.table_name}.{fmt}"
+        path = str(out_dir / file_name)
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(path, schema)
+        else:
+            writer = pa.ipc.new_file(path, schema)
+        rows = 0
+        try:
+            for batch in batches:
+                record_batch = self._to_record_batch(batch, columns, schema)
+                if fmt == "parquet":
+                    writer.write_table(pa.Table.from_batches([record_batch]))
+                else:
+                    writer.write(record_batch)
+                rows += len(batch)
+        finally:
+            writer.close()
+        return rows, {"data": file_name}
+
+
+if __name__ == "__main__":
+    exporter = DatasetExporter(
+        "zvt_comp", "./configs/secrets.yml", "./configs/database.yml"
+    )
+    exporter.export("./datasets/zvt_comp", fmt="npy")
@@ -0,0 +1,95 @@
+import os
+from functools import lru_cache
+from types import MappingProxyType
+
+import pandas as pd
+
+
+@lru_cache(maxsize=None)
+def _read_game_info(game_info_file):
+    """
+        Returns:
+            types: dict - name ==> type
+            races: dict - name ==> race
+    """
+    game_info = pd.read_csv(game_info_file, index_col="name")
+    types = {str(name): str(val) for name, val in game_info["type"].items()}
+    races = {str(name): str(val) for name, val in game_info["race"].items()}
+    return types, races
+
+
+@lru_cache(maxsize=None)
+def _read_supply_data(supply_data_file):
+    """
+        Returns:
+            supply: dict - name ==> supply
+            supply_lower: dict - lowercase name ==> supply
+    """
+    supply_data = pd.read_csv(supply_data_file, index_col="name")
+    supply = {str(name): float(val) for name, val in supply_data["supply"].items()}
+    return supply, {name.lower(): val for name, val in supply.items()}
+
+
+class GameDataCatalog:
+    """
+        Read-only lookups over `game_info.csv` and `supply_data.csv`.
+
+        Each file is read once per process, whatever other file it is
+        paired with. Lookups are plain dicts so they can be used inside
+        per-row loops. Use `get_catalog` to share the instance between
+        classes.
+
+        Attributes:
+            types: Mapping[str, str] - name ==> type ('Unit', 'Building', ...)
+            races: Mapping[str, str] - name ==> race ('Zerg', 'Terran', ...)
+            supply: Mapping[str, float] - name ==> supply
+            supply_lower: Mapping[str, float] - lowercase name ==> supply
+    """
+
+    def __init__(self, game_info_file=None, supply_data_file=None) -> None:
+        """
+            Args:
+                game_info_file: str | None - path to game_info.csv
+                supply_data_file: str | None - path to supply_data.csv
+        """
+        types, races = {}, {}
+        if game_info_file is not None:
+            types, races = _read_game_info(os.path.abspath(game_info_file))
+        supply, supply_lower = {}, {}
+        if supply_data_file is not None:
+            supply, supply_lower = _read_supply_data(os.path.abspath(supply_data_file))
+        self.types = MappingProxyType(types)
+        self.races = MappingProxyType(races)
+        self.supply = MappingProxyType(supply)
+        self.supply_lower = MappingProxyType(supply_lower)
+        self._column_names = {}
+
+    def column_name(self, player_num, name):
+        """
+            Returns build_order column name of the game object
+            Args:
+                player_num: int - player number, starts from 1
+                name: str - object name as in game_info.csv,
+                    unknown names have 'special' type
+            Returns:
+                column: str - for example 'player_1_unit_drone'
+        """
+        key = (player_num, name)
+        if key not in self._column_names:
+            val_type = self.types.get(name, "special").lower()
+            self._column_names[key] = f"player_{player_num}_{val_type}_{name.lower()}"
+        return self._column_names[key]
+
+
+@lru_cache(maxsize=None)
+def get_catalog(game_info_file=None, supply_data_file=None):
+    """
+        Returns the catalog shared by every caller with the same files,
+        the tables of each file are shared by all the catalogs
+        Args:
+            game_info_file: str | None - path to game_info.csv
+            supply_data_file: str | None - path to supply_data.csv
+        Returns:
+            catalog: GameDataCatalog
+    """
+    return GameDataCatalog(game_info_file, supply_data_file)
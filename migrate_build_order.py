@@ -0,0 +1,74 @@
+import numpy as np
+from alive_progress import alive_it
+
+from database_access import BuildOrder, BuildOrderPacked
+from setup_logger import get_logger
+
+
+def pack_game(columns, rows):
+    """
+        Converts wide build_order rows of one game into `BuildOrderPacked` input.
+        Columns which are NULL in every row are dropped, other NULLs become 0.
+        Args:
+            columns: Sequence[str] - wide table columns
+            rows: list[Sequence] - rows of the game ordered by tick
+        Returns:
+            columns: list[str] - `game_id`, `tick` and the game's columns
+            values: np.ndarray - (ticks, columns) int32 array
+    """
+    values = np.array(rows, dtype=object)
+    is_null = np.equal(values, None)
+    positions = {col: i for i, col in enumerate(columns)}
+    keep = [positions["game_id"], positions["tick"]] + [
+        i
+        for i, col in enumerate(columns)
+        if col not in ("game_id", "tick") and not is_null[:, i].all()
+    ]
+    values[is_null] = 0
+    return [columns[i] for i in keep], values[:, keep].astype(np.int32)
+
+
+def migrate(secrets_path, db_config_path, games_per_batch=100):
+    """
+        Copies games from the wide `build_order` table into `build_order_packed`.
+        Games which are already packed are skipped, so the migration
+        can be interrupted and started again.
+        Args:
+            secrets_path: str - path to the secrets file
+            db_config_path: str - path to the db config
+            games_per_batch: int - games read from the wide table per query
+        Returns:
+            migrated: int - number of migrated games
+    """
+    logger = get_logger(__name__)
+    wide_db = BuildOrder(secrets_path, db_config_path)
+    packed_db = BuildOrderPacked(secrets_path, db_config_path)
+    with packed_db as db:
+        db.create_table()
+        done = set(db.get_game_ids())
+    with wide_db as db:
+        game_ids = [game_id for game_id in db.iter_game_ids() if game_id not in done]
+
+    batches = [
+        game_ids[start:start + games_per_batch]
+        for start in range(0, len(game_ids), games_per_batch)
+    ]
+    for batch in alive_it(batches, title="Migration"):
+        with wide_db as db:
+            columns, rows = db.get_games(batch)
+        game_id_pos = columns.index("game_id")
+        by_game = {}
+        for row in rows:
+            by_game.setdefault(row[game_id_pos], []).append(row)
+        with packed_db as db:
+            for game_rows in by_game.values():
+                db.put_array(*pack_game(columns, game_rows))
+
+    info = f"{len(game_ids)} games migrated, {len(done)} were already packed"
+    logger.info(info)
+    print(info)
+    return len(game_ids)
+
+
+if __name__ == "__main__":
+    migrate("./configs/secrets.yml", "./configs/database.yml")
@@ -1,8 +1,12 @@
+import sys
+from contextlib import ExitStack
 from itertools import permutations, zip_longest
+from multiprocessing import Pool
 
 from alive_progress import alive_bar, alive_it
 
 from database_access import BuildOrder, GameInfo
+from storage import PostgresStorage
 from training_data import (CalcWinprob, DensityVals, Extractor, Loader,
                            NormalizeColumns, RandomPoints, ReorganizePlayers)
 
@@ -19,11 +23,22 @@ class Pipeline:
         `(matchup)_comp`
         `(matchup)_winprob`
         `(matchup)_enemycomp`
+
+    `player_filter` and `enemy_filter` are `NormalizeColumns.setup_filter`
+    arguments of `transform_player` and `transform_enemy`, None if
+    the transform doesn't read build_order. `out_filters` are
+    (side, arguments) pairs used by `transform_outs`, side is
+    "player" or "enemy". They define the columns read from build_order.
     """
 
     steps = []
+    player_filter = None
+    enemy_filter = None
+    out_filters = []
     possible_r = set(("z", "t", "p"))
     ticks_per_min = 960
+    # Games sampled with one build_order query
+    games_per_block = 64
 
     def __init__(
         self,
@@ -34,6 +49,7 @@ class Pipeline:
         tick_step=16,
         min_len=1920,
         jupyter=None,
+        progress=True,
     ) -> None:
         """
         Args:
@@ -44,25 +60,33 @@ class Pipeline:
             tick_step: int - step in tick in the database
             min_len: int - minimum game length in ticks
             jupyter: bool | None - fix progress bar
+            progress: bool - show progress bar
         """
         self.player_r = player_r
         self.enemy_r = enemy_r
         self.ticks_per_point = mins_per_point * self.ticks_per_min
         self.jupyter = jupyter
+        self.progress = progress
         self.game_ticks_per_second = game_ticks_per_second
         self.tick_step = tick_step
         self.min_len = min_len
 
-    def configure_dbs(self, secrets_path, db_config_path):
+    def configure_dbs(self, secrets_path, db_config_path, storage=None):
         """
         Configures preprocessed data tables.
 
         Args:
             secrets_path: str - path to secrets file
             db_config_path: str - path to db config
+            storage: Storage | None - read preprocessed data from
+                     the storage instead of the DB tables
         """
         self.secrets_path = secrets_path
         self.db_config_path = db_config_path
+        if storage is not None:
+            self.game_info_db = storage.game_info_db
+            self.build_order_db = storage.build_order_db
+            return
         self.game_info_db = GameInfo(secrets_path, db_config_path)
         self.build_order_db = BuildOrder(secrets_path, db_config_path)
 
@@ -79,14 +103,14 @@ class Pipeline:
             player_r, enemy_r, min_league, include_unranked
         )
 
-    def configure_points(self, sigma, get_final_point, final_point_step):
+    def configure_points(self, sigma, get_final_point, final_point_step, seed=None):
         """
-        Configures ReorganizePlayers class
+        Configures RandomPoints class
         Args:
-            player_r: str - player's game race
-            enemy_r: str - enemy's game race
-            min_league: int - filter out leagues below this val
-            include_unranked: bool - include league=0
+            sigma: float - sigma of the random step size
+            get_final_point: bool - include final points
+            final_point_step: int - distance to the final point in ticks
+            seed: int | None - random points seed of the run
         """
         self.points = RandomPoints(
             mean_step=self.ticks_per_point,
@@ -94,6 +118,7 @@ class Pipeline:
             get_final_point=get_final_point,
             final_point_step=final_point_step,
             tick_step=self.tick_step,
+            seed=seed,
         )
 
     def configure_normalize(self, game_info_file, supply_data_file):
@@ -131,6 +156,40 @@ class Pipeline:
             self.game_info_db, self.build_order_db, self.game_ticks_per_second
         )
 
+    def get_required_columns(self, columns):
+        """
+        Returns build_order columns used by the pipeline's filters.
+        Players are swapped for every game, so the columns of both
+        players are included.
+
+        Args:
+            columns: Sequence[str] - build_order table columns
+        Returns:
+            required: list[str] - columns in the order of `columns`
+        """
+        filters = list(self.out_filters)
+        if self.player_filter is not None:
+            filters.append(("player", self.player_filter))
+        if self.enemy_filter is not None:
+            filters.append(("enemy", self.enemy_filter))
+        required = set(Extractor.key_columns)
+        for player in ("player_1", "player_2"):
+            for side, kwargs in filters:
+                r = self.player_r if side == "player" else self.enemy_r
+                self.normalize.setup_filter(player, r, **kwargs)
+                required.update(self.normalize.get_required_columns(columns))
+        return [col for col in columns if col in required]
+
+    def configure_columns(self):
+        """
+        Makes the extractor select only the columns used by the pipeline.
+        Storages without a common column list read all columns.
+        """
+        with self.build_order_db as db:
+            columns = db.get_table_columns()
+        if columns:
+            self.extractor.select_columns(self.get_required_columns(columns))
+
     def transform_player(self, data, player):
         raise NotImplementedError
 
@@ -142,6 +201,35 @@ class Pipeline:
     ):
         raise NotImplementedError
 
+    def transform_outs(self, samples, player, enemy, is_win, end_tick):
+        """
+        Calls `transform_out` for every sample of the game,
+        pipelines override it with a batch version.
+
+        Args:
+            samples: list[tuple] - (start_dict, end_dict, end_point)
+            player: str - ['player_1', 'player_2']
+            enemy: str - ['player_1', 'player_2']
+            is_win: bool - player's game result
+            end_tick: int - last tick of the game
+        Returns:
+            out_dicts: list[dict]
+        """
+        return [
+            self.transform_out(
+                start_dict, end_dict, player, enemy, end_point, is_win, end_tick
+            )
+            for start_dict, end_dict, end_point in samples
+        ]
+
+    def _to_array(self, columns, dicts):
+        try:
+            return [[data[col] for col in columns] for data in dicts]
+        except KeyError as exc:
+            raise ValueError(
+                f"Bad input data, key '{exc.args[0]}' is not in second dict"
+            ) from exc
+
     def _configure_loader(self, table_type):
         self.loader = Loader(
             self.secrets_path,
@@ -154,15 +242,16 @@ class Pipeline:
     def configure_loader(self):
         raise NotImplementedError
 
-    def _iter_id_player_is_win(self, ids):
-        if self.jupyter is not None:
+    def _iter_id_player_is_win(self, candidates):
+        if not self.progress:
+            bar = candidates
+        elif self.jupyter is not None:
             alive_bar()
-            bar = alive_it(ids, title="Pipeline", force_tty=self.jupyter)
+            bar = alive_it(candidates, title="Pipeline", force_tty=self.jupyter)
         else:
-            bar = alive_it(ids, title="Pipeline")
+            bar = alive_it(candidates, title="Pipeline")
 
-        for id in bar:
-            data = self.extractor.extract_data(id)
+        for id, data in bar:
             p1_data = data["player_1"].copy()
             p2_data = data["player_2"].copy()
             for i in range(2):
@@ -177,52 +266,199 @@ class Pipeline:
                 if is_pass:
                     yield (id, curr_player, is_win, data["end_tick"])
 
-    def run(self):
+    def _iter_blocks(self, candidates, is_pending):
+        """
+        Groups passed players into blocks of `games_per_block` games.
+        A game is in the dataset after its first player is processed,
+        so only the first pending player of a game is kept.
+
+        Args:
+            candidates: Iterable[tuple] - `Extractor.extract_candidates` output
+            is_pending: Callable[[int], bool] - the game needs processing
+        Yields:
+            block: list[tuple] - (game_id, player, is_win, end_tick)
+        """
+        block = []
+        block_ids = set()
+        for game in self._iter_id_player_is_win(candidates):
+            if game[0] in block_ids or not is_pending(game[0]):
+                continue
+            block.append(game)
+            block_ids.add(game[0])
+            if len(block) >= self.games_per_block:
+                yield block
+                block = []
+                block_ids = set()
+        if block:
+            yield block
+
+    def check_steps(self):
+        """
+        Raises ValueError if some of the `steps` are not configured
+        """
+        if not all((hasattr(self, name) for name in self.steps)):
+            vals = [f"{name}: {hasattr(self, name)}\n" for name in self.steps]
+            raise ValueError(f"Missing configured steps: \n{vals}")
+
+    def sample_games(self, games):
+        """
+        Gets random points of the games and their build_order data.
+        Ticks of all games are fetched in one query.
+
+        Args:
+            games: list[tuple] - (game_id, player, is_win, end_tick)
+        Returns:
+            samples: list[tuple] - (starting_dicts, end_dicts, end_points)
+                     of each game, where
+                starting_dicts: list[dict] - data at the starting points
+                end_dicts: list[dict] - data at the end points
+                end_points: list[int] - end points
+        """
+        game_ids = [game_id for game_id, _, _, _ in games]
+        points = self.points.transform_batch(
+            [end_tick for _, _, _, end_tick in games], game_ids
+        )
+        requests = {}
+        for game_id, (starting_points, end_points) in zip(game_ids, points):
+            requests.setdefault(game_id, []).extend(starting_points + end_points)
+        rows = self.extractor.extract_build_order_block(requests)
+        samples = []
+        for game_id, (starting_points, end_points) in zip(game_ids, points):
+            starting_dicts = [dict(rows[(game_id, tick)]) for tick in starting_points]
+            end_dicts = [dict(rows[(game_id, tick)]) for tick in end_points]
+            samples.append((starting_dicts, end_dicts, end_points))
+        return samples
+
+    def process_game(self, game_id, player, is_win, end_tick, samples):
+        """
+        Transforms sampled data of the player and loads it into the table.
+
+        Args:
+            game_id: int - game_id
+            player: str - ['player_1', 'player_2']
+            is_win: bool - player's game result
+            end_tick: int - last tick of the game
+            samples: tuple - the game's `sample_games` output
+        """
+        enemy = "player_1" if player == "player_2" else "player_2"
+        samples = [
+            sample
+            for sample in zip_longest(*samples)
+            if not self.loader.check_if_tick_exists(game_id, sample[0]["tick"])
+        ]
+        if not samples:
+            return
+        out_dicts = self.transform_outs(samples, player, enemy, is_win, end_tick)
+        for (start_dict, _, _), out_dict in zip(samples, out_dicts):
+            player_dict = self.transform_player(start_dict, player)
+            enemy_dict = self.transform_enemy(start_dict, enemy)
+            self.loader.upload_data(
+                game_id, start_dict["tick"], player_dict, enemy_dict, out_dict
+            )
+
+    def run(self, ids=None):
         """
         Run pipeline.
 
+        Args:
+            ids: list[int] | None - process these game ids only
+
         Transformation process:
-            1. Extract all game ids from the game_info
+            1. Extract ids of the matchup games from the game_info
             2. For each player:
             2.1 Get random starting and ending ticks
-            2.2 Get player's build_order data for each tick
+            2.2 Get build_order data for each tick,
+                one query per `games_per_block` games
             2.3 Transform extracted data columns to expected format
-            2.4 Load data into a new table
+            2.4 Load data into a new table,
+                buffered rows are flushed on exit
         """
-        if not all((hasattr(self, name) for name in self.steps)):
-            vals = [f"{name}: {hasattr(self, name)}\n" for name in self.steps]
-            raise ValueError(f"Missing configured steps: \n{vals}")
+        self.check_steps()
 
-        ids = self.extractor.extract_ids()
-        self.loader.prepare()
+        candidates = self.extractor.extract_candidates(self.organize, ids)
+        self.loader.prepare(ids)
 
-        for game_id, player, is_win, end_tick in self._iter_id_player_is_win(ids):
-            if self.loader.check_if_game_exists(game_id):
-                continue
+        def is_pending(game_id):
+            return not self.loader.check_if_game_exists(game_id)
+
+        with self.loader:
+            for block in self._iter_blocks(candidates, is_pending):
+                for game, samples in zip(block, self.sample_games(block)):
+                    self.process_game(*game, samples)
+
+
+class FusedPipeline:
+    """
+    Runs several pipelines of the same matchup in one pass.
+
+    Game ids, players and build_order data are extracted once
+    by the first pipeline and passed to every pipeline's transforms,
+    each pipeline writes into its own table.
+    """
+
+    def __init__(self, pipelines) -> None:
+        """
+        Args:
+            pipelines: list[Pipeline] - configured pipelines,
+                       the first one extracts and samples the data
+        """
+        if not pipelines:
+            raise ValueError("No pipelines to run")
+        races = {(pipeline.player_r, pipeline.enemy_r) for pipeline in pipelines}
+        if len(races) > 1:
+            raise ValueError(f"Pipelines have different matchups: {races}")
+        self.pipelines = pipelines
+        self.main = pipelines[0]
+        self._select_columns()
+
+    def _select_columns(self):
+        # The main pipeline reads build_order for every pipeline
+        selected = [pipeline.extractor.columns for pipeline in self.pipelines]
+        if any(columns is None for columns in selected):
+            self.main.extractor.select_columns(None)
+            return
+        union = {}
+        for columns in selected:
+            union.update(dict.fromkeys(columns))
+        self.main.extractor.select_columns(list(union))
+
+    def run(self, ids=None):
+        """
+        Run all pipelines.
+
+        Args:
+            ids: list[int] | None - process these game ids only
+
+        Transformation process:
+            1. Extract ids of the matchup games from the game_info
+            2. For each player:
+            2.1 Get random starting and ending ticks
+            2.2 Get build_order data for each tick,
+                one query per `games_per_block` games
+            2.3 Transform the data with each pipeline
+            2.4 Load data into each pipeline's table
+        """
+        for pipeline in self.pipelines:
+            pipeline.check_steps()
+
+        candidates = self.main.extractor.extract_candidates(self.main.organize, ids)
+        for pipeline in self.pipelines:
+            pipeline.loader.prepare(ids)
 
-            enemy = "player_1" if player == "player_2" else "player_2"
-            starting_points, end_points = self.points.transform(end_tick)
-            starting_dicts = self.extractor.extract_build_order(
-                game_id, starting_points
+        def is_pending(game_id):
+            return any(
+                not pipeline.loader.check_if_game_exists(game_id)
+                for pipeline in self.pipelines
             )
-            if end_points:
-                end_dicts = self.extractor.extract_build_order(game_id, end_points)
-            else:
-                end_dicts = []
-            for start_dict, end_dict, end_point in zip_longest(
-                starting_dicts, end_dicts, end_points
-            ):
-                player_dict = self.transform_player(start_dict, player)
-                enemy_dict = self.transform_enemy(start_dict, enemy)
-                out_dict = self.transform_out(
-                    start_dict, end_dict, player, enemy, end_point, is_win, end_tick
-                )
 
-                tick = start_dict["tick"]
-                if not self.loader.check_if_tick_exists(game_id, tick):
-                    self.loader.upload_data(
-                        game_id, tick, player_dict, enemy_dict, out_dict
-                    )
+        with ExitStack() as stack:
+            for pipeline in self.pipelines:
+                stack.enter_context(pipeline.loader)
+            for block in self.main._iter_blocks(candidates, is_pending):
+                for game, samples in zip(block, self.main.sample_games(block)):
+                    for pipeline in self.pipelines:
+                        if not pipeline.loader.check_if_game_exists(game[0]):
+                            pipeline.process_game(*game, samples)
 
 
 class CompPipeline(Pipeline):
@@ -239,31 +475,42 @@ class CompPipeline(Pipeline):
         "loader",
     ]
 
+    player_filter = {"include_buildings": True, "include_special": True}
+    enemy_filter = {}
+    out_filters = [("player", {})]
+
     def configure_loader(self):
         super()._configure_loader("comp")
 
     def transform_player(self, data, player):
-        self.normalize.setup_filter(
-            player,
-            self.player_r,
-            include_buildings=True,
-            include_special=True,
-        )
+        self.normalize.setup_filter(player, self.player_r, **self.player_filter)
         return self.normalize.transform(data)
 
     def transform_enemy(self, data, enemy):
-        self.normalize.setup_filter(enemy, self.enemy_r)
+        self.normalize.setup_filter(enemy, self.enemy_r, **self.enemy_filter)
         return self.normalize.transform(data)
 
     def transform_out(
         self, earlier_data, later_data, player, enemy, final_tick, is_win, end_tick
     ):
-        self.normalize.setup_filter(player, self.player_r)
+        self.normalize.setup_filter(player, self.player_r, **self.out_filters[0][1])
         out1_dict = self.normalize.transform(earlier_data)
         out2_dict = self.normalize.transform(later_data)
         out_dict = self.dense.transform_diff(out1_dict, out2_dict)
         return out_dict
 
+    def transform_outs(self, samples, player, enemy, is_win, end_tick):
+        self.normalize.setup_filter(player, self.player_r, **self.out_filters[0][1])
+        out1_dicts = [self.normalize.transform(start) for start, _, _ in samples]
+        out2_dicts = [self.normalize.transform(end) for _, end, _ in samples]
+        columns = list(out2_dicts[0])
+        values = self.dense.transform_diff_batch(
+            columns,
+            self._to_array(columns, out1_dicts),
+            self._to_array(columns, out2_dicts),
+        )
+        return [dict(zip(columns, row)) for row in values.tolist()]
+
 
 class WinprobPipeline(Pipeline):
     """
@@ -280,21 +527,22 @@ class WinprobPipeline(Pipeline):
         "loader",
     ]
 
+    player_filter = {
+        "include_buildings": True,
+        "include_upgrades": True,
+        "include_special": True,
+    }
+    enemy_filter = {"include_buildings": True}
+
     def configure_loader(self):
         super()._configure_loader("winprob")
 
     def transform_player(self, data, player):
-        self.normalize.setup_filter(
-            player,
-            self.player_r,
-            include_buildings=True,
-            include_upgrades=True,
-            include_special=True,
-        )
+        self.normalize.setup_filter(player, self.player_r, **self.player_filter)
         return self.normalize.transform(data)
 
     def transform_enemy(self, data, enemy):
-        self.normalize.setup_filter(enemy, self.enemy_r, include_buildings=True)
+        self.normalize.setup_filter(enemy, self.enemy_r, **self.enemy_filter)
         return self.normalize.transform(data)
 
     def transform_out(
@@ -304,6 +552,11 @@ class WinprobPipeline(Pipeline):
         out_dict["is_win"] = self.winprob.transform(final_tick, is_win, end_tick)
         return out_dict
 
+    def transform_outs(self, samples, player, enemy, is_win, end_tick):
+        final_ticks = [end_point for _, _, end_point in samples]
+        values = self.winprob.transform_batch(final_ticks, is_win, end_tick)
+        return [{"is_win": val} for val in values.tolist()]
+
 
 class EnemycompPipeline(Pipeline):
     """
@@ -319,6 +572,9 @@ class EnemycompPipeline(Pipeline):
         "loader",
     ]
 
+    enemy_filter = {"include_buildings": True, "include_units": False}
+    out_filters = [("enemy", {"include_buildings": True})]
+
     def configure_loader(self):
         super()._configure_loader("enemycomp")
 
@@ -326,37 +582,64 @@ class EnemycompPipeline(Pipeline):
         return {}
 
     def transform_enemy(self, data, enemy):
-        self.normalize.setup_filter(
-            enemy,
-            self.enemy_r,
-            include_buildings=True,
-            include_units=False,
-        )
+        self.normalize.setup_filter(enemy, self.enemy_r, **self.enemy_filter)
         return self.normalize.transform(data)
 
     def transform_out(
         self, earlier_data, later_data, player, enemy, final_tick, is_win, end_tick
     ):
-        self.normalize.setup_filter(enemy, self.enemy_r, include_buildings=True)
+        self.normalize.setup_filter(enemy, self.enemy_r, **self.out_filters[0][1])
         out_dict = self.normalize.transform(earlier_data)
         out_dict = self.dense.transform_single(out_dict)
         return out_dict
 
+    def transform_outs(self, samples, player, enemy, is_win, end_tick):
+        self.normalize.setup_filter(enemy, self.enemy_r, **self.out_filters[0][1])
+        out_dicts = [self.normalize.transform(start) for start, _, _ in samples]
+        columns = list(out_dicts[0])
+        values = self.dense.transform_single_batch(
+            columns, self._to_array(columns, out_dicts)
+        )
+        return [dict(zip(columns, row)) for row in values.tolist()]
+
 
 class PipelineComposer:
     """
     Configures and returns pipeline for each case.
     """
 
-    def __init__(self, matchup: str, tick_step=16, jupyter=None) -> None:
+    # Dataset name -> method returning the configured pipeline,
+    # every method takes (mins_per_sample, prediction_minute_step, min_league, reducer)
+    registered = {
+        "comp": "get_compositon",
+        "winprob": "get_win_probability",
+        "enemycomp": "get_enemy_composition",
+    }
+
+    def __init__(
+        self,
+        matchup: str,
+        tick_step=16,
+        jupyter=None,
+        progress=True,
+        seed=None,
+        storage=None,
+    ) -> None:
         """
         Args:
             matchup: str - two game races separated with 'v' ['ZvT', 'TvP' ...]
             tick_step: int - step of data in preprocessed DB
             jupyter: bool | None - fix progress bar
+            progress: bool - show pipelines' progress bar
+            seed: int | None - random points seed of the run
+            storage: Storage | None - preprocessed data storage,
+                     the DB tables by default
         """
         self.player_r, self.enemy_r = matchup.lower().split("v")
         self.jupyter = jupyter
+        self.progress = progress
+        self.seed = seed
+        self.storage = storage
         self.tick_step = tick_step
         self.secrets_path = "./configs/secrets.yml"
         self.db_config_path = "./configs/database.yml"
@@ -390,17 +673,20 @@ class PipelineComposer:
             game_ticks_per_second=16,
             tick_step=self.tick_step,
             jupyter=self.jupyter,
+            progress=self.progress,
         )
         final_point_step = prediction_minute_step * pipeline.ticks_per_min
-        pipeline.configure_dbs(self.secrets_path, self.db_config_path)
+        pipeline.configure_dbs(self.secrets_path, self.db_config_path, self.storage)
         pipeline.configure_extractor()
         pipeline.configure_organize(self.player_r, self.enemy_r, min_league)
         pipeline.configure_points(
             final_point_step * 0.5,
             get_final_point=True,
             final_point_step=final_point_step,
+            seed=self.seed,
         )
         pipeline.configure_normalize(self.game_info_file, self.supply_data_file)
+        pipeline.configure_columns()
         pipeline.configure_dense(self.supply_data_file, reducer)
         pipeline.configure_loader()
         return pipeline
@@ -418,17 +704,20 @@ class PipelineComposer:
             game_ticks_per_second=16,
             tick_step=self.tick_step,
             jupyter=self.jupyter,
+            progress=self.progress,
         )
         final_point_step = prediction_minute_step * pipeline.ticks_per_min
-        pipeline.configure_dbs(self.secrets_path, self.db_config_path)
+        pipeline.configure_dbs(self.secrets_path, self.db_config_path, self.storage)
         pipeline.configure_extractor()
         pipeline.configure_organize(self.player_r, self.enemy_r, min_league)
         pipeline.configure_points(
             final_point_step * 0.5,
             get_final_point=True,
             final_point_step=final_point_step,
+            seed=self.seed,
         )
         pipeline.configure_normalize(self.game_info_file, self.supply_data_file)
+        pipeline.configure_columns()
         # Delay determines tolerance for game lengths >> final_point_step
         pipeline.configure_calc_winprob(delay=5)
         pipeline.configure_dense(self.supply_data_file, reducer)
@@ -448,40 +737,250 @@ class PipelineComposer:
             game_ticks_per_second=16,
             tick_step=self.tick_step,
             jupyter=self.jupyter,
+            progress=self.progress,
         )
         final_point_step = prediction_minute_step * pipeline.ticks_per_min
-        pipeline.configure_dbs(self.secrets_path, self.db_config_path)
+        pipeline.configure_dbs(self.secrets_path, self.db_config_path, self.storage)
         pipeline.configure_extractor()
         pipeline.configure_organize(self.player_r, self.enemy_r, min_league)
         pipeline.configure_points(
             final_point_step * 0.5,
             get_final_point=True,
             final_point_step=final_point_step,
+            seed=self.seed,
         )
         pipeline.configure_normalize(self.game_info_file, self.supply_data_file)
+        pipeline.configure_columns()
         pipeline.configure_dense(self.supply_data_file, reducer)
         pipeline.configure_loader()
         return pipeline
 
+    def get_all(
+        self,
+        mins_per_sample,
+        prediction_minute_step,
+        min_league,
+        reducer="avg",
+        names=None,
+    ):
+        """
+        Configure and return registered pipelines
+        Args:
+            names: list[str] | None - registered dataset names, all by default
+        """
+        names = self.registered.keys() if names is None else names
+        return [
+            getattr(self, self.registered[name])(
+                mins_per_sample, prediction_minute_step, min_league, reducer
+            )
+            for name in names
+        ]
+
+    def get_fused(
+        self,
+        mins_per_sample,
+        prediction_minute_step,
+        min_league,
+        reducer="avg",
+        names=None,
+    ):
+        """
+        Configure and return FusedPipeline of registered pipelines
+        Args:
+            names: list[str] | None - registered dataset names, all by default
+        """
+        return FusedPipeline(
+            self.get_all(
+                mins_per_sample, prediction_minute_step, min_league, reducer, names
+            )
+        )
+
+
+_worker_settings = {}
+_worker_pipelines = {}
+
+
+def _init_dataset_worker(settings):
+    _worker_settings.update(settings)
+
+
+def _run_dataset_task(task):
+    """
+    Runs fused pipeline of the matchup on a shard of game ids.
+    Pipelines are configured once per worker and matchup.
+    """
+    matchup, _, ids = task
+    settings = _worker_settings
+    if matchup not in _worker_pipelines:
+        storage = None
+        if settings["packed_build_order"]:
+            storage = PostgresStorage(
+                settings["secrets_path"],
+                settings["db_config_path"],
+                packed_build_order=True,
+            )
+        composer = PipelineComposer(
+            matchup,
+            tick_step=settings["tick_step"],
+            progress=False,
+            seed=settings["seed"],
+            storage=storage,
+        )
+        _worker_pipelines[matchup] = composer.get_fused(
+            settings["mins_per_sample"],
+            settings["prediction_minute_step"],
+            settings["min_league"],
+            settings["reducer"],
+            settings["names"],
+        )
+    pipeline = _worker_pipelines[matchup]
+    pipeline.run(ids)
+    return len(ids)
+
+
+class ParallelRunner:
+    """
+    Builds datasets of several matchups using a process pool.
+
+    Candidate game ids of each matchup are split into shards,
+    every (matchup, shard) pair is processed by a FusedPipeline
+    in a worker process.
+    Each worker opens its own DB connections. Random points are seeded
+    with (seed, game_id), so the datasets don't depend on the sharding.
+    """
+
+    def __init__(
+        self,
+        matchups,
+        mins_per_sample,
+        prediction_minute_step,
+        min_league,
+        reducer="avg",
+        names=None,
+        tick_step=16,
+        workers=None,
+        shard_size=500,
+        seed=0,
+        packed_build_order=False,
+        jupyter=None,
+    ) -> None:
+        """
+        Args:
+            matchups: list[str] - matchups ['ZvT', 'TvP' ...]
+            mins_per_sample: int - used in random sampling
+            prediction_minute_step: int - distance to the final point in minutes
+            min_league: int - filter out leagues below this val
+            reducer: str - ['avg', 'softmax'] reducer formula
+            names: list[str] | None - registered dataset names, all by default
+            tick_step: int - step of data in preprocessed DB
+            workers: int | None - number of processes, all cores by default
+            shard_size: int - game ids per task
+            seed: int - random points seed of the run
+            packed_build_order: bool - read build order from
+                                the `build_order_packed` table
+            jupyter: bool | None - fix progress bar
+        """
+        self.matchups = [matchup.lower() for matchup in matchups]
+        self.settings = {
+            "mins_per_sample": mins_per_sample,
+            "prediction_minute_step": prediction_minute_step,
+            "min_league": min_league,
+            "reducer": reducer,
+            "names": names,
+            "tick_step": tick_step,
+            "seed": seed,
+            "packed_build_order": packed_build_order,
+        }
+        self.workers = workers
+        self.shard_size = shard_size
+        self.jupyter = jupyter
+        self.secrets_path = "./configs/secrets.yml"
+        self.db_config_path = "./configs/database.yml"
+        self.settings["secrets_path"] = self.secrets_path
+        self.settings["db_config_path"] = self.db_config_path
+
+    def get_matchup_ids(self):
+        """
+        Extracts candidate game ids of each matchup
+        Returns:
+            ids: dict - {matchup: list[int]}
+        """
+        extractor = Extractor(
+            GameInfo(self.secrets_path, self.db_config_path),
+            BuildOrder(self.secrets_path, self.db_config_path),
+            ticks_per_second=16,
+        )
+        ids = {}
+        for matchup in self.matchups:
+            player_r, enemy_r = matchup.split("v")
+            organize = ReorganizePlayers(
+                player_r, enemy_r, self.settings["min_league"]
+            )
+            candidates = extractor.extract_candidates(organize)
+            ids[matchup] = [game_id for game_id, _ in candidates]
+        return ids
+
+    def get_tasks(self, ids):
+        """
+        Splits game ids into (matchup, shard, ids) tasks
+        Args:
+            ids: dict - {matchup: list[int]} game ids
+        Returns:
+            tasks: list[tuple]
+        """
+        tasks = []
+        for matchup in self.matchups:
+            matchup_ids = ids[matchup]
+            for num, start in enumerate(
+                range(0, len(matchup_ids), self.shard_size)
+            ):
+                tasks.append(
+                    (matchup, num, matchup_ids[start:start + self.shard_size])
+                )
+        return tasks
+
+    def run(self, ids=None):
+        """
+        Run pipelines in parallel.
+
+        Args:
+            ids: list[int] | None - process these game ids only
+        """
+        if ids is None:
+            matchup_ids = self.get_matchup_ids()
+        else:
+            matchup_ids = {matchup: ids for matchup in self.matchups}
+        tasks = self.get_tasks(matchup_ids)
+        total = sum(len(task_ids) for _, _, task_ids in tasks)
+
+        bar_kwargs = {"title": "Datasets"}
+        if self.jupyter is not None:
+            bar_kwargs["force_tty"] = self.jupyter
+        with alive_bar(total, **bar_kwargs) as bar, Pool(
+            self.workers,
+            initializer=_init_dataset_worker,
+            initargs=(self.settings,),
+        ) as pool:
+            for done in pool.imap_unordered(_run_dataset_task, tasks):
+                bar(done)
+
 
 if __name__ == "__main__":
     MINS_PER_SAMPLE = 4
     PRED_STEP = 1
     MIN_LEAGUE = 3
-    r_pairs = permutations("ZTP", 2)
-    matchups = ["v".join((r1, r2)) for r1, r2 in r_pairs]
-    composer = PipelineComposer("ZvZ", tick_step=32)
-    matchups = ["zvt"]
-    for matchup in matchups:
-        composer.change_matchup(matchup)
-        comp_pipeline = composer.get_compositon(MINS_PER_SAMPLE, PRED_STEP, MIN_LEAGUE)
-        winprob_pipeline = composer.get_win_probability(
-            MINS_PER_SAMPLE, PRED_STEP, MIN_LEAGUE
+    if "--parallel" in sys.argv:
+        # All matchups in a process pool
+        r_pairs = permutations("ZTP", 2)
+        matchups = ["v".join((r1, r2)) for r1, r2 in r_pairs]
+        runner = ParallelRunner(
+            matchups, MINS_PER_SAMPLE, PRED_STEP, MIN_LEAGUE, tick_step=32
         )
-        enemycomp_pipeline = composer.get_enemy_composition(
-            MINS_PER_SAMPLE, PRED_STEP, MIN_LEAGUE
-        )
-
-        comp_pipeline.run()
-        winprob_pipeline.run()
-        enemycomp_pipeline.run()
+        runner.run()
+    else:
+        composer = PipelineComposer("ZvZ", tick_step=32)
+        matchups = ["zvt"]
+        for matchup in matchups:
+            composer.change_matchup(matchup)
+            pipeline = composer.get_fused(MINS_PER_SAMPLE, PRED_STEP, MIN_LEAGUE)
+            pipeline.run()
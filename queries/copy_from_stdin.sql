@@ -0,0 +1 @@
+COPY {} ({cols}) FROM STDIN WITH (FORMAT csv);
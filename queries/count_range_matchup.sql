@@ -0,0 +1,3 @@
+SELECT count(*) FROM {}
+WHERE (%(min_id)s IS NULL OR game_id >= %(min_id)s)
+AND (%(max_id)s IS NULL OR game_id < %(max_id)s);
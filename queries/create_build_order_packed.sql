@@ -0,0 +1,5 @@
+CREATE TABLE IF NOT EXISTS build_order_packed(
+game_id INTEGER PRIMARY KEY,
+columns TEXT[] NOT NULL,
+data BYTEA NOT NULL,
+FOREIGN KEY (game_id) REFERENCES game_info(game_id));
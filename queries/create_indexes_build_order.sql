@@ -0,0 +1 @@
+CREATE INDEX IF NOT EXISTS build_order_game_tick_idx ON build_order (game_id, tick);
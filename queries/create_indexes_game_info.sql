@@ -0,0 +1,2 @@
+CREATE INDEX IF NOT EXISTS game_info_players_hash_idx ON game_info (players_hash, timestamp_played);
+CREATE INDEX IF NOT EXISTS game_info_matchup_idx ON game_info (lower(matchup));
@@ -0,0 +1,2 @@
+CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table}
+FOR VALUES WITH (MODULUS {modulus}, REMAINDER {remainder});
@@ -1,4 +1,5 @@
-CREATE TABLE IF NOT EXISTS {}(
+SELECT pg_advisory_xact_lock(hashtext('{0}'));
+CREATE TABLE IF NOT EXISTS {0}(
 tick INTEGER,
 game_id INTEGER,
 {cols},
@@ -0,0 +1 @@
+DROP INDEX IF EXISTS build_order_game_tick_idx;
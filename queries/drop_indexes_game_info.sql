@@ -0,0 +1,2 @@
+DROP INDEX IF EXISTS game_info_players_hash_idx;
+DROP INDEX IF EXISTS game_info_matchup_idx;
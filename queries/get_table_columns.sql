@@ -0,0 +1,4 @@
+SELECT column_name FROM information_schema.columns
+WHERE table_schema = 'public'
+  AND table_name = %(table_name)s
+ORDER BY ordinal_position;
@@ -1,2 +1,3 @@
 INSERT INTO {}(game_id, tick, {cols})
-VALUES (%(game_id)s, %(tick)s, {formatted_cols});
+VALUES (%(game_id)s, %(tick)s, {formatted_cols})
+ON CONFLICT DO NOTHING;
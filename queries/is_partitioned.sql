@@ -0,0 +1,4 @@
+SELECT EXISTS (
+    SELECT 1 FROM pg_partitioned_table
+    WHERE partrelid = to_regclass(%(table_name)s)
+);
@@ -0,0 +1,44 @@
+CREATE TABLE IF NOT EXISTS map_info(
+map_hash TEXT PRIMARY KEY,
+map_name TEXT,
+matchup_type TEXT,
+first_game_date TEXT);
+
+CREATE TABLE IF NOT EXISTS player_info(
+player_id INTEGER PRIMARY KEY,
+nickname TEXT,
+games_played INTEGER,
+zerg_played INTEGER,
+protoss_played INTEGER,
+terran_played INTEGER,
+wins INTEGER,
+loses INTEGER,
+most_played_race TEXT,
+highest_league INTEGER);
+
+CREATE TABLE IF NOT EXISTS game_info(
+game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+timestamp_played INTEGER NOT NULL,
+date_processed TEXT,
+players_hash TEXT NOT NULL,
+end_time INTEGER,
+player_1_id INTEGER NOT NULL,
+player_1_race TEXT NOT NULL,
+player_1_league INTEGER,
+player_1_winner INTEGER,
+player_2_id INTEGER NOT NULL,
+player_2_race TEXT NOT NULL,
+player_2_league INTEGER,
+player_2_winner INTEGER,
+map_hash TEXT NOT NULL,
+matchup TEXT NOT NULL,
+is_ladder INTEGER,
+replay_path TEXT);
+
+CREATE INDEX IF NOT EXISTS game_info_players_hash_idx ON game_info (players_hash, timestamp_played);
+CREATE INDEX IF NOT EXISTS game_info_matchup_idx ON game_info (lower(matchup));
+
+CREATE TABLE IF NOT EXISTS build_order(
+game_id INTEGER PRIMARY KEY REFERENCES game_info(game_id),
+columns TEXT NOT NULL,
+data BLOB NOT NULL);
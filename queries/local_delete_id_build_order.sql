@@ -0,0 +1 @@
+DELETE FROM build_order WHERE game_id = ?;
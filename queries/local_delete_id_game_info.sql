@@ -0,0 +1 @@
+DELETE FROM game_info WHERE game_id = ?;
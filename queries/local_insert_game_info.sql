@@ -0,0 +1,2 @@
+INSERT INTO game_info(timestamp_played, date_processed, players_hash, end_time, player_1_id, player_1_race, player_1_winner, player_1_league, player_2_id, player_2_race, player_2_winner, player_2_league, map_hash, matchup, is_ladder, replay_path)
+VALUES (:timestamp_played, :date_processed, :players_hash, :end_time, :player_1_id, :player_1_race, :player_1_winner, :player_1_league, :player_2_id, :player_2_race, :player_2_winner, :player_2_league, :map_hash, :matchup, :is_ladder, :replay_path);
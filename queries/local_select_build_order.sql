@@ -0,0 +1 @@
+SELECT columns, data FROM build_order WHERE game_id = ?;
@@ -0,0 +1,3 @@
+SELECT game_id FROM game_info
+WHERE players_hash = ?
+  AND timestamp_played = ?;
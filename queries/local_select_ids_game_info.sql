@@ -0,0 +1 @@
+SELECT game_id FROM game_info ORDER BY game_id;
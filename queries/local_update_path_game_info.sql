@@ -0,0 +1 @@
+UPDATE game_info SET replay_path = ? WHERE game_id = ?;
@@ -0,0 +1 @@
+INSERT OR REPLACE INTO build_order(game_id, columns, data) VALUES (?, ?, ?);
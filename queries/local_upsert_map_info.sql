@@ -0,0 +1,7 @@
+INSERT INTO map_info AS m(map_hash, map_name, matchup_type, first_game_date)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (map_hash) DO UPDATE
+SET
+map_name = excluded.map_name,
+matchup_type = excluded.matchup_type,
+first_game_date = max(m.first_game_date, excluded.first_game_date);
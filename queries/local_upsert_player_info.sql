@@ -0,0 +1,20 @@
+INSERT INTO player_info AS p(player_id, nickname, games_played, zerg_played, protoss_played, terran_played, wins, loses, most_played_race, highest_league)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (player_id) DO UPDATE
+SET
+nickname = excluded.nickname,
+games_played = p.games_played + excluded.games_played,
+zerg_played = p.zerg_played + excluded.zerg_played,
+protoss_played = p.protoss_played + excluded.protoss_played,
+terran_played = p.terran_played + excluded.terran_played,
+wins = p.wins + excluded.wins,
+loses = p.loses + excluded.loses,
+most_played_race = CASE
+    WHEN p.zerg_played + excluded.zerg_played >= max(
+        p.protoss_played + excluded.protoss_played,
+        p.terran_played + excluded.terran_played
+    ) THEN 'z'
+    WHEN p.protoss_played + excluded.protoss_played >= p.terran_played + excluded.terran_played THEN 'p'
+    ELSE 't'
+END,
+highest_league = max(p.highest_league, excluded.highest_league);
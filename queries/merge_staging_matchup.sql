@@ -0,0 +1,4 @@
+INSERT INTO {table} ({cols})
+SELECT {cols} FROM {staging}
+ON CONFLICT DO NOTHING;
+TRUNCATE {staging};
@@ -0,0 +1,3 @@
+PREPARE {name} AS
+INSERT INTO {table}({cols})
+VALUES ({params});
@@ -0,0 +1,6 @@
+PREPARE {name} (INTEGER, INTEGER) AS
+SELECT * FROM {table}
+WHERE
+game_id = $1
+AND
+tick = $2;
@@ -0,0 +1,3 @@
+SELECT build_order.* FROM build_order
+JOIN unnest(%(game_ids)s::INTEGER[], %(ticks)s::INTEGER[]) AS keys(game_id, tick)
+USING (game_id, tick);
@@ -0,0 +1,5 @@
+SELECT * FROM build_order
+WHERE
+game_id = %(game_id)s
+AND
+tick = ANY(%(ticks)s);
@@ -0,0 +1,9 @@
+SELECT game_id, end_time, player_1_race, player_1_winner, player_1_league, player_2_race, player_2_winner, player_2_league FROM game_info
+WHERE lower(matchup) IN (%(matchup)s, %(reverse_matchup)s)
+AND (
+    (player_1_race = %(player)s AND player_2_race = %(enemy)s
+    AND (player_1_league >= %(min_league)s OR (%(include_unranked)s AND player_1_league = 0)))
+    OR (player_2_race = %(player)s AND player_1_race = %(enemy)s
+    AND (player_2_league >= %(min_league)s OR (%(include_unranked)s AND player_2_league = 0)))
+)
+ORDER BY game_id;
@@ -0,0 +1,3 @@
+SELECT {cols} FROM {table}
+JOIN unnest(%(game_ids)s::INTEGER[], %(ticks)s::INTEGER[]) AS keys(game_id, tick)
+USING (game_id, tick);
@@ -0,0 +1,5 @@
+SELECT {cols} FROM {table}
+WHERE
+game_id = %(game_id)s
+AND
+tick = ANY(%(ticks)s);
@@ -0,0 +1,2 @@
+SELECT game_id, columns, data FROM {}
+WHERE game_id = ANY(%(game_ids)s);
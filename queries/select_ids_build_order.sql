@@ -0,0 +1 @@
+SELECT DISTINCT game_id FROM {} ORDER BY game_id;
@@ -0,0 +1 @@
+SELECT game_id FROM {} ORDER BY game_id;
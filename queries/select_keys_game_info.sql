@@ -0,0 +1 @@
+SELECT game_id, players_hash, timestamp_played, replay_path FROM game_info;
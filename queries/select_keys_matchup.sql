@@ -0,0 +1 @@
+SELECT game_id, tick FROM {};
@@ -0,0 +1,2 @@
+SELECT game_id, tick FROM {}
+WHERE game_id = ANY(%(game_ids)s);
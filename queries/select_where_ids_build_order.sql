@@ -0,0 +1,3 @@
+SELECT * FROM {}
+WHERE game_id = ANY(%(game_ids)s)
+ORDER BY game_id, tick;
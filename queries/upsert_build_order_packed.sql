@@ -0,0 +1,6 @@
+INSERT INTO {}(game_id, columns, data)
+VALUES %s
+ON CONFLICT (game_id) DO UPDATE
+SET
+columns = EXCLUDED.columns,
+data = EXCLUDED.data;
@@ -0,0 +1,7 @@
+INSERT INTO map_info AS m(map_hash, map_name, matchup_type, first_game_date)
+VALUES %s
+ON CONFLICT (map_hash) DO UPDATE
+SET
+map_name = EXCLUDED.map_name,
+matchup_type = EXCLUDED.matchup_type,
+first_game_date = GREATEST(m.first_game_date, EXCLUDED.first_game_date);
@@ -0,0 +1,20 @@
+INSERT INTO player_info AS p(player_id, nickname, games_played, zerg_played, protoss_played, terran_played, wins, loses, most_played_race, highest_league)
+VALUES %s
+ON CONFLICT (player_id) DO UPDATE
+SET
+nickname = EXCLUDED.nickname,
+games_played = p.games_played + EXCLUDED.games_played,
+zerg_played = p.zerg_played + EXCLUDED.zerg_played,
+protoss_played = p.protoss_played + EXCLUDED.protoss_played,
+terran_played = p.terran_played + EXCLUDED.terran_played,
+wins = p.wins + EXCLUDED.wins,
+loses = p.loses + EXCLUDED.loses,
+most_played_race = CASE
+    WHEN p.zerg_played + EXCLUDED.zerg_played >= GREATEST(
+        p.protoss_played + EXCLUDED.protoss_played,
+        p.terran_played + EXCLUDED.terran_played
+    ) THEN 'z'
+    WHEN p.protoss_played + EXCLUDED.protoss_played >= p.terran_played + EXCLUDED.terran_played THEN 'p'
+    ELSE 't'
+END,
+highest_league = GREATEST(p.highest_league, EXCLUDED.highest_league);
@@ -0,0 +1,179 @@
+import hashlib
+import sqlite3
+import time
+from pathlib import Path
+
+from setup_logger import get_logger
+
+
+def file_hash(file_path):
+    """
+        Returns sha256 of the file content
+        Args:
+            file_path: Path - path to the file
+        Returns:
+            hexdigest: str
+    """
+    with open(file_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ReplayManifest:
+    """
+        On-disk record of the processed replay files.
+
+        Stores the content hash, processing status, filter report and
+        game id of every file, so the next run only touches new or
+        changed files. Unchanged files are detected by their size and
+        modification time, the content hash is computed only if they
+        differ. Files recorded without a hash are processed again
+        once their size or modification time changes.
+        The manifest is a SQLite file and doesn't need the Postgres DB.
+
+        Statuses:
+            'done' - the game is in the DB
+            'corrupted' - the game is in the DB without build order
+            'failed' - the replay can't be parsed
+            'filtered' - stopped by the filter
+            'invalid' - the build order data is invalid
+    """
+
+    columns = {
+        "path": "TEXT PRIMARY KEY",
+        "size": "INTEGER",
+        "mtime": "REAL",
+        "content_hash": "TEXT",
+        "status": "TEXT",
+        "report": "TEXT",
+        "game_id": "INTEGER",
+        "updated_at": "REAL",
+    }
+    select_query = "SELECT {} FROM replays"
+    insert_query = "INSERT OR REPLACE INTO replays({}) VALUES ({})"
+    commit_every = 100
+
+    def __init__(self, manifest_path) -> None:
+        """
+            Args:
+                manifest_path: str - path to the SQLite file, created if missing
+        """
+        self.manifest_path = Path(manifest_path)
+        self.logger = get_logger(__name__)
+        self.conn = sqlite3.connect(self.manifest_path)
+        self._create_table()
+        names = ", ".join(self.columns)
+        self.files = {
+            row[0]: dict(zip(self.columns, row))
+            for row in self.conn.execute(self.select_query.format(names))
+        }
+        self._uncommitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_table(self):
+        cols = ", ".join(f"{name} {col_type}" for name, col_type in self.columns.items())
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS replays({cols})")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def _stat(self, replay_path):
+        replay_path = Path(replay_path)
+        stat = replay_path.stat()
+        return str(replay_path.resolve()), stat.st_size, stat.st_mtime
+
+    def needs_processing(self, replay_path, retry=()):
+        """
+            Check if the file is new, changed or has a status to retry
+            Args:
+                replay_path: Path - path to the replay
+                retry: Iterable[str] - statuses to process again
+            Returns:
+                is_needed: bool
+        """
+        path, size, mtime = self._stat(replay_path)
+        record = self.files.get(path)
+        if record is None or record["status"] is None:
+            return True
+        if record["size"] != size or record["mtime"] != mtime:
+            if record["content_hash"] is None:
+                return True
+            if record["content_hash"] != file_hash(replay_path):
+                return True
+            # Touched but not changed
+            self._write(record | {"size": size, "mtime": mtime})
+        return record["status"] in retry
+
+    def is_recorded(self, replay_path):
+        """
+            Check if the file was processed before, it doesn't
+            tell if the file has changed (see `needs_processing`)
+            Args:
+                replay_path: Path - path to the replay
+            Returns:
+                is_recorded: bool
+        """
+        record = self.files.get(str(Path(replay_path).resolve()))
+        return record is not None and record["status"] is not None
+
+    def add(self, replay_path, status, game_id=None, report="", content_hash=None):
+        """
+            Record the processed replay file
+            Args:
+                replay_path: Path - path to the replay
+                status: str - processing status (see the class doc)
+                game_id: int | None - id in the game_info table
+                report: str - filter report or error message
+                content_hash: str | None - `file_hash` of the replay,
+                    None records only the size and modification time
+        """
+        path, size, mtime = self._stat(replay_path)
+        record = {
+            "path": path,
+            "size": size,
+            "mtime": mtime,
+            "content_hash": content_hash,
+            "status": status,
+            "report": report,
+            "game_id": game_id,
+            "updated_at": time.time(),
+        }
+        self._write(record)
+
+    def _write(self, record):
+        self.files[record["path"]] = record
+        query = self.insert_query.format(
+            ", ".join(self.columns), ", ".join("?" for _ in self.columns)
+        )
+        self.conn.execute(query, [record[name] for name in self.columns])
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.conn.commit()
+            self._uncommitted = 0
+
+    def get_paths(self, status):
+        """
+            Returns paths of the files with the status
+            Args:
+                status: str - processing status
+            Returns:
+                paths: list[Path]
+        """
+        return [
+            Path(path) for path, record in self.files.items() if record["status"] == status
+        ]
+
+    def summary(self):
+        """
+            Returns the number of files for each status
+        """
+        counts = {}
+        for record in self.files.values():
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return counts
@@ -1,12 +1,18 @@
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 from functools import wraps
+from multiprocessing import Pool
+from time import perf_counter
 
-import pandas as pd
+import numpy as np
+import sc2reader
 from alive_progress import alive_it
 
-from database_access import BuildOrder, GameInfo, MapInfo, PlayerInfo
+from game_catalog import get_catalog
+from replay_manifest import ReplayManifest, file_hash
 from setup_logger import get_logger
+from storage import PostgresStorage
 from starcraft2_replay_parse.replay_tools import BuildOrderData, ReplayData
 
 
@@ -30,6 +36,9 @@ class ReplayFilter:
         game_len:
             Skip if the game is too short or too long.
 
+    All the filters except `league` can be checked before the
+    replay is parsed, see `check_header`.
+
     """
 
     _is_ladder_types = {
@@ -76,6 +85,15 @@ class ReplayFilter:
         "matchup",
         "game_len",
     )
+    # Filters which can be checked with the replay metadata only
+    _header_filters = (
+        "is_ladder",
+        "time_played",
+        "is_1v1",
+        "has_race",
+        "matchup",
+        "game_len",
+    )
 
     def __init__(self) -> None:
         for filter_name in self._list_filters:
@@ -274,79 +292,89 @@ class ReplayFilter:
             return replay_len >= self.game_len[0] and replay_len <= self.game_len[1]
         return replay_len >= self.game_len
 
-    def __call__(self, replay):
-        replay_dict = replay.as_dict()
-        replay_dict["date"] = replay.replay.date
+    def _run_filters(self, replay_dict, names):
         for i, name in enumerate(self._list_filters):
-            check_method = getattr(self, f"check_{name}")
-            self.passed_filters[i] = check_method(replay_dict)
+            if name in names:
+                check_method = getattr(self, f"check_{name}")
+                self.passed_filters[i] = check_method(replay_dict)
+            else:
+                self.passed_filters[i] = True
         self.report = "\n".join(
             [
                 f"{'! '*val}{name}==>{'Pass' if val else 'Fail'}"
                 for name, val in zip(self._list_filters, self.passed_filters)
+                if name in names
             ]
         )
         return all(self.passed_filters)
 
+    def get_header_dict(self, replay_path):
+        """
+            Loads replay metadata without the game and tracker events.
+            Level 2 is the lowest one where sc2reader loads
+            the players, `teams` and `real_type` are empty before it.
+            Args:
+                replay_path: Path - path to the `.SC2Replay` file
+            Returns:
+                replay_dict: dict - values used by the header filters
+        """
+        replay = sc2reader.load_replay(str(replay_path), load_level=2)
+        matchup = "v".join(
+            "".join(player.play_race[0] for player in team.players)
+            for team in replay.teams
+        )
+        return {
+            "is_ladder": replay.is_ladder,
+            "date": replay.date,
+            "mode": replay.real_type,
+            "matchup": matchup,
+            "frames": replay.frames,
+        }
 
-class ReplayProcess:
+    def check_header(self, replay_path):
+        """
+            Runs the filters which don't need the full replay.
+            Should be called before parsing, if the header can't be
+            loaded the replay passes to the full check.
+            Args:
+                replay_path: Path - path to the `.SC2Replay` file
+            Returns:
+                is_pass: bool
+        """
+        try:
+            replay_dict = self.get_header_dict(replay_path)
+        except Exception as exc:
+            self.logger.warning(f"Can't load header of {replay_path}: {exc}")
+            return True
+        return self._run_filters(replay_dict, self._header_filters)
+
+    def __call__(self, replay):
+        replay_dict = replay.as_dict()
+        replay_dict["date"] = replay.replay.date
+        return self._run_filters(replay_dict, self._list_filters)
+
+
+class ReplayParser:
     """
-        Loads replays from the filesystem, processes them
-        using the starcraft2_replay_parse lib and sends them 
-        to the database.
+        Parses a single replay into rows ready for the database.
 
-        This is a preprocessing step. The training data is 
-        prepared in the pipeline.
+        The class does not access the database and its results are
+        picklable, so it can be used inside worker processes.
     """
-    def __init__(
-        self,
-        secrets_path,
-        db_config,
-        game_data_path,
-        max_tick=28800,
-        ticks_per_pos=32,
-        jupyter=None,
-    ) -> None:
+    def __init__(self, game_data_path, max_tick=28800, ticks_per_pos=32) -> None:
         """
             Args:
-                secrets_path: str - path to the secrets file
-                db_config: str - path to the db config
                 game_data_path: str - path to the game_info.csv file
                 max_tick: int - maximum game length in tick (1s = 16 ticks)
                 ticks_per_pos: int - step size between values in the DB
-                jupyter: bool | None - fix the progress bar issues
         """
-        self.game_info_db = GameInfo(secrets_path, db_config)
-        self.build_order_db = BuildOrder(secrets_path, db_config)
-        self.player_info_db = PlayerInfo(secrets_path, db_config)
-        self.map_info_db = MapInfo(secrets_path, db_config)
-        self.dbs = [
-            self.map_info_db,
-            self.player_info_db,
-            self.game_info_db,
-            self.build_order_db,
-        ]
-
-        self.init_dbs()
         self.build_order_cls = BuildOrderData(max_tick, ticks_per_pos, game_data_path)
-        self.game_data = pd.read_csv(game_data_path, index_col="name")
-        self.jupyter = jupyter
+        self.catalog = get_catalog(game_data_path)
         self.logger = get_logger(__name__)
-        self.corrupted_data_list = []
-
-    def init_dbs(self):
-        """
-            Creates the necessary DBs
-        """
-        for db in self.dbs:
-            # with db:
-            #     db.drop()
-            with db:
-                db.create_table()
 
-    def _upload_game_info(self, replay, replay_path):
+    def get_game_info(self, replay, replay_path):
         """
-            Upload data into the game_info DB
+            Returns data for the game_info DB
         """
         replay_data = replay.as_dict()
         game_info = {}
@@ -385,12 +413,11 @@ class ReplayProcess:
         game_info["matchup"] = replay_data["matchup"]
         game_info["is_ladder"] = replay.is_ranked
         game_info["replay_path"] = str(replay_path.resolve())
-        game_id = self._upload_info(self.game_info_db, game_info)
-        return game_id
+        return game_info
 
-    def _upload_map_info(self, replay):
+    def get_map_info(self, replay):
         """
-            Upload data into the map_info DB
+            Returns data for the map_info DB
         """
         replay_data = replay.as_dict()
         num_players = len(replay_data["matchup"].split("v")) // 2
@@ -402,14 +429,15 @@ class ReplayProcess:
             "matchup_type": matchup_type,
             "game_date": date,
         }
-        self._upload_info(self.map_info_db, map_info)
+        return map_info
 
-    def _upload_player_info(self, replay):
+    def get_player_info(self, replay):
         """
-            Upload data into the player_info DB
+            Returns data for the player_info DB, one dict per player
         """
         replay_data = replay.as_dict()
         forbidden_symbols = "%<>&;"
+        players = []
         for name in replay.player_names:
             if any(s in name for s in forbidden_symbols):
                 nickname = "||||||||||||"
@@ -422,80 +450,250 @@ class ReplayProcess:
                 "league_int": replay_data["players_data"][name]["league"],
                 "is_win": name in replay_data["winners"],
             }
-            self._upload_info(self.player_info_db, player_info)
+            players.append(player_info)
+        return players
 
-    def delete_game(self, game_id):
+    def get_build_order(self, replay):
         """
-            Deletes game from the game_info table.
-            Useful then the upload was interrupted.
+            Returns build_order data without `game_id` as an array.
+            Raises:
+                KeyError - the replay has invalid build order data
+            Returns:
+                columns: list[str] - column names, the first one is `tick`
+                values: np.ndarray - (ticks, columns) int32 array
+                is_corrupted: bool - the first tick has no workers
         """
-        with self.game_info_db as db:
-            db.delete_id(game_id)
+        replay_data = replay.as_dict()
+        ticks = self.build_order_cls.get_ticks()
+        n_ticks = len(ticks)
+        columns = ["tick"]
+        col_values = [ticks]
+        unit_counts = self.build_order_cls.yield_unit_counts(replay_data)
+        for i, build_order_dict in enumerate(unit_counts):
+            for key, val in build_order_dict.items():
+                columns.append(self.catalog.column_name(i + 1, key))
+                col_values.append(val[:n_ticks])
+        values = np.array(col_values, dtype=np.int32).T
+
+        # One of this values is always > 0 at tick 0, if not, the game is corrupted
+        col_pos = {col: i for i, col in enumerate(columns)}
+        workers = [
+            col_pos["player_1_unit_scv"],
+            col_pos["player_1_unit_drone"],
+            col_pos["player_1_unit_probe"],
+        ]
+        first_rows = values[values[:, 0] == 0][:, workers]
+        if (first_rows == 0).all(axis=1).any():
+            return columns, values[:0], True
+        return columns, values, False
 
-    def _upload_build_order(self, replay, game_id, bar=None):
+    def parse(self, replay_path, filt=None, with_hash=False):
         """
-            Upload data into the build_order DB
+            Parses and filters the replay.
+            Args:
+                replay_path: Path - path to the `.SC2Replay` file
+                filt: ReplayFilter | None - filter instance
+                with_hash: bool - compute `content_hash` of the file
+                    for the `ReplayManifest`, None otherwise
+            Returns:
+                parsed: dict - result with the `status` key:
+                    'failed' - the replay can't be parsed (see `message`)
+                    'filtered' - stopped by the filter (see `message`)
+                    'invalid' - the build order data is invalid
+                    'ok' - rows for each DB are in the dict
         """
-        replay_data = replay.as_dict()
-        full_upload_dict = {}
+        timings = {}
+        parsed = {
+            "replay_path": replay_path,
+            "status": "ok",
+            "message": "",
+            "content_hash": file_hash(replay_path) if with_hash else None,
+            "timings": timings,
+        }
+        if filt is not None:
+            start = perf_counter()
+            is_pass = filt.check_header(replay_path)
+            timings["header"] = perf_counter() - start
+            if not is_pass:
+                parsed["status"] = "filtered"
+                parsed["message"] = (
+                    f"Replay skipped, reason: \nStopped by filter: {filt.report}"
+                )
+                return parsed
+
+        start = perf_counter()
         try:
-            unit_counts = list(self.build_order_cls.yield_unit_counts(replay_data))
+            replay = ReplayData().parse_replay(replay_path)
+        except Exception as exc:
+            parsed["status"] = "failed"
+            parsed["message"] = f"Replay skipped, reason:\n{exc}"
+            return parsed
+        timings["parse"] = perf_counter() - start
+
+        if filt is not None:
+            if not filt(replay):
+                parsed["status"] = "filtered"
+                parsed["message"] = (
+                    f"Replay skipped, reason: \nStopped by filter: {filt.report}"
+                )
+                return parsed
+
+        start = perf_counter()
+        try:
+            columns, build_order, is_corrupted = self.get_build_order(replay)
         except KeyError as exc:
-            msg = "INVALID REPLAY: %s" % exc
-            self.logger.warning(msg)
-            print(msg)
-            self.delete_game(game_id)
-            return
+            parsed["status"] = "invalid"
+            parsed["message"] = "INVALID REPLAY: %s" % exc
+            return parsed
+        timings["build_order"] = perf_counter() - start
 
-        for i, build_order_dict in enumerate(unit_counts):
-            for key, val in build_order_dict.items():
-                try:
-                    val_type = self.game_data.loc[key, "type"].lower()
-                except KeyError:
-                    val_type = "special"
-                new_key = f"player_{i+1}_{val_type}_{key.lower()}"
-                full_upload_dict[new_key] = val
+        parsed["players_hash"] = replay.players_hash
+        parsed["timestamp_played"] = int(replay.replay.date.timestamp())
+        parsed["map_info"] = self.get_map_info(replay)
+        parsed["player_info"] = self.get_player_info(replay)
+        parsed["game_info"] = self.get_game_info(replay, replay_path)
+        parsed["build_order_columns"] = columns
+        parsed["build_order"] = build_order
+        parsed["is_corrupted"] = is_corrupted
+        return parsed
+
+
+_worker_parser = None
+
+
+def _init_parser_worker(game_data_path, max_tick, ticks_per_pos):
+    global _worker_parser
+    _worker_parser = ReplayParser(game_data_path, max_tick, ticks_per_pos)
 
-        ticks = self.build_order_cls.get_ticks()
-        ticks_len = len(ticks)
-        exit_code = False
-        to_upload_list = []
-        for j, tick in enumerate(ticks):
-            to_upload_dict = {}
-            for key, val in full_upload_dict.items():
-                to_upload_dict[key] = val[j]
-            to_upload_dict["game_id"] = game_id
-            to_upload_dict["tick"] = tick
-            if tick == 0:
-                # One of this values is always > 0, if not, the game is corrupted
-                s, d, p = (
-                    to_upload_dict["player_1_unit_scv"],
-                    to_upload_dict["player_1_unit_drone"],
-                    to_upload_dict["player_1_unit_probe"],
-                )
-                if s == d == p == 0:
-                    print(f"Corrupted data at game_id = {game_id}")
-                    self.corrupted_data_list.append(game_id)
-                    return
 
-            to_upload_list.append(to_upload_dict)
-            if bar is not None:
-                bar.text = f"Processed {j/ticks_len:.1%}"
-        if exit_code:
-            raise KeyboardInterrupt
+def _parse_in_worker(args):
+    replay_path, filt, with_hash = args
+    return _worker_parser.parse(replay_path, filt, with_hash)
 
-        with self.build_order_db as db:
-            for data_info in to_upload_list:
-                db.put(**data_info)
 
-    def _upload_info(self, db, to_upload_dict):
+class ReplayProcess:
+    """
+        Loads replays from the filesystem, processes them
+        using the starcraft2_replay_parse lib and sends them 
+        to the database (or another `storage.Storage`).
+
+        This is a preprocessing step. The training data is 
+        prepared in the pipeline.
+    """
+    def __init__(
+        self,
+        secrets_path,
+        db_config,
+        game_data_path,
+        max_tick=28800,
+        ticks_per_pos=32,
+        jupyter=None,
+        upload_batch_size=None,
+        storage=None,
+    ) -> None:
         """
-            Upload the parsed data into the DB
+            Args:
+                secrets_path: str - path to the secrets file
+                db_config: str - path to the db config
+                game_data_path: str - path to the game_info.csv file
+                max_tick: int - maximum game length in tick (1s = 16 ticks)
+                ticks_per_pos: int - step size between values in the DB
+                jupyter: bool | None - fix the progress bar issues
+                upload_batch_size: int | None - collect several replays
+                    until this many build_order rows are buffered and upload
+                    them in one transaction, None uploads every replay separately
+                storage: Storage | None - where the replays are written,
+                    `PostgresStorage` from secrets_path and db_config by default
         """
-        out = None
-        with db:
-            out = db.put(**to_upload_dict)
-        return out
+        if storage is None:
+            storage = PostgresStorage(secrets_path, db_config)
+        self.storage = storage
+
+        self.init_dbs()
+        self.parser_args = (game_data_path, max_tick, ticks_per_pos)
+        self.parser = ReplayParser(*self.parser_args)
+        self.jupyter = jupyter
+        self.logger = get_logger(__name__)
+        self.corrupted_data_list = []
+        self.upload_batch_size = upload_batch_size
+        # {columns: [arrays]} build_order rows waiting for upload
+        self._build_order_buffer = {}
+        # Parsed replays of new games waiting for upload
+        self._pending = []
+        self._pending_rows = 0
+        self._known_games = {}
+        self._known_paths = {}
+        self.manifest = None
+        self.stage_timings = {}
+
+    def init_dbs(self):
+        """
+            Creates the necessary DBs
+        """
+        self.storage.create_tables()
+
+    def delete_game(self, game_id):
+        """
+            Deletes game from the game_info table.
+            Useful then the upload was interrupted.
+        """
+        self.storage.delete_game(game_id)
+
+    def _upload_build_order(self, columns, build_order, game_id):
+        """
+            Upload data into the build_order DB
+        """
+        values = np.empty((len(build_order), len(columns) + 1), dtype=np.int32)
+        values[:, 0] = game_id
+        values[:, 1:] = build_order
+        columns = ("game_id", *columns)
+        self._build_order_buffer.setdefault(columns, []).append(values)
+
+    def _flush_build_order(self):
+        """
+            Upload buffered build_order rows into the DB
+        """
+        if not self._build_order_buffer:
+            return
+        for columns, arrays in self._build_order_buffer.items():
+            self.storage.put_build_order(list(columns), np.concatenate(arrays))
+        self._build_order_buffer = {}
+
+    def _flush_pending(self):
+        """
+            Upload the pending replays and their build_order rows
+            in one transaction. Replays are marked as processed
+            only after the transaction is committed.
+        """
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending = []
+        self._pending_rows = 0
+        try:
+            with self.storage.transaction():
+                game_ids = [self._upload_new_game(parsed) for parsed in pending]
+                self._flush_build_order()
+        except Exception as e:
+            # The transaction is rolled back, none of the replays are uploaded
+            self._build_order_buffer = {}
+            message = f"Replay upload failed, reason:\n{e}"
+            print(message)
+            self.logger.error(message)
+            for parsed in pending:
+                parsed["message"] = message
+                self._mark_processed(parsed, "failed")
+            return
+
+        for parsed, game_id in zip(pending, game_ids):
+            game_key = (parsed["players_hash"], parsed["timestamp_played"])
+            self._known_games[game_key] = game_id
+            status = "done"
+            if parsed["is_corrupted"]:
+                print(f"Corrupted data at game_id = {game_id}")
+                self.corrupted_data_list.append(game_id)
+                status = "corrupted"
+            self._mark_processed(parsed, status, game_id)
 
     def game_id_if_exists(self, players_hash, timestamp_played):
         """
@@ -506,58 +704,200 @@ class ReplayProcess:
             Returns:
                 game_id: int | None - return id if it exists
         """
-        with self.game_info_db:
-            return self.game_info_db.get_id_if_exists(players_hash, timestamp_played)
+        return self.storage.get_game_id(players_hash, timestamp_played)
+
+    def _load_known_games(self):
+        """
+            Load keys of the ingested games with a single query
+        """
+        self._known_games, self._known_paths = self.storage.get_ingested_keys()
+
+    def _mark_processed(self, parsed, status, game_id=None):
+        replay_path = parsed["replay_path"]
+        if game_id is not None:
+            self._known_paths[str(replay_path.resolve())] = game_id
+        if self.manifest is not None:
+            self.manifest.add(
+                replay_path,
+                status,
+                game_id=game_id,
+                report=parsed["message"],
+                content_hash=parsed["content_hash"],
+            )
+
+    def _prescan(self, list_file, retry=()):
+        """
+            Returns replays which are not in the DB yet.
+            If the manifest is used, recorded files are processed again
+            only if their content has changed or their status is in `retry`.
+            Files without a record are compared by their path,
+            the file content is not parsed.
+        """
+        new_files = []
+        for replay_path in list_file:
+            if self.manifest is not None:
+                if not self.manifest.needs_processing(replay_path, retry):
+                    continue
+                if self.manifest.is_recorded(replay_path):
+                    # Changed file or a status to retry, the path isn't enough
+                    new_files.append(replay_path)
+                    continue
+            game_id = self._known_paths.get(str(replay_path.resolve()))
+            if game_id is not None:
+                if self.manifest is not None:
+                    # Size and mtime only, the file isn't read
+                    self.manifest.add(replay_path, "done", game_id=game_id)
+                continue
+            new_files.append(replay_path)
+        skipped = len(list_file) - len(new_files)
+        info = f"{skipped} of {len(list_file)} replays are already in the db"
+        self.logger.info(info)
+        print(info)
+        return new_files
+
+    def _upload_new_game(self, parsed):
+        """
+            Upload rows of a game which is not in the DB yet
+        """
+        self.storage.put_map(parsed["map_info"])
+        self.storage.put_players(parsed["player_info"])
+        id = self.storage.put_game(parsed["game_info"])
+        if parsed["is_corrupted"]:
+            return id
+        self._upload_build_order(
+            parsed["build_order_columns"], parsed["build_order"], id
+        )
+        return id
 
-    def process_replays(self, replay_dir, filt=None):
+    def _upload_parsed(self, parsed):
+        """
+            Upload the result of `ReplayParser.parse` into the DBs
+        """
+        if parsed["status"] == "failed":
+            print(parsed["message"])
+            self.logger.error(parsed["message"])
+            self._mark_processed(parsed, "failed")
+            return
+        if parsed["status"] == "filtered":
+            self.logger.info(parsed["message"])
+            print(parsed["message"])
+            self._mark_processed(parsed, "filtered")
+            return
+        if parsed["status"] == "invalid":
+            self.logger.warning(parsed["message"])
+            print(parsed["message"])
+            self._mark_processed(parsed, "invalid")
+            return
+
+        replay_path = parsed["replay_path"]
+        game_key = (parsed["players_hash"], parsed["timestamp_played"])
+        if any(
+            (other["players_hash"], other["timestamp_played"]) == game_key
+            for other in self._pending
+        ):
+            # The same game from another file, upload the first one
+            self._flush_pending()
+        game_id = self._known_games.get(game_key)
+        if game_id is None:
+            self._pending.append(parsed)
+            if not parsed["is_corrupted"]:
+                self._pending_rows += len(parsed["build_order"])
+            if (
+                self.upload_batch_size is None
+                or self._pending_rows >= self.upload_batch_size
+            ):
+                self._flush_pending()
+            return
+
+        self.storage.update_path(game_id, str(replay_path.resolve()))
+        info = "Replay skipped, reason:\nAlready exists in the db (path updated)"
+        self.logger.info(info)
+        print(info)
+        status = "corrupted" if game_id in self.corrupted_data_list else "done"
+        self._mark_processed(parsed, status, game_id)
+
+    def _add_timings(self, timings):
+        for stage, val in timings.items():
+            total, count = self.stage_timings.get(stage, (0.0, 0))
+            self.stage_timings[stage] = (total + val, count + 1)
+
+    def _log_timings(self):
+        for stage, (total, count) in self.stage_timings.items():
+            info = (
+                f"Stage '{stage}': {count} replays, "
+                f"{total:.1f}s total, {total / count:.3f}s avg"
+            )
+            self.logger.info(info)
+            print(info)
+
+    def _iter_parsed(self, list_file, filt, workers):
+        # The file hash is only stored in the manifest
+        with_hash = self.manifest is not None
+        if workers is None or workers <= 1:
+            for replay_path in list_file:
+                yield self.parser.parse(replay_path, filt, with_hash)
+            return
+
+        tasks = [(replay_path, filt, with_hash) for replay_path in list_file]
+        with Pool(
+            workers,
+            initializer=_init_parser_worker,
+            initargs=self.parser_args,
+        ) as pool:
+            yield from pool.imap_unordered(_parse_in_worker, tasks)
+
+    def process_replays(
+        self,
+        replay_dir,
+        filt=None,
+        workers=None,
+        manifest_path=None,
+        retry=(),
+        defer_indexes=False,
+    ):
         """
             Load replay from the filesystem into the DB.
             Parse data from `.SC2Replay` object into the DB rows.
+            Replays which are already in the DB are skipped before parsing.
             Shows progress bar
             Args:
                 replay_dir: str - path to the directory with replays
                 filt: ReplayFilter | None - filter instance
+                workers: int | None - number of parsing processes,
+                    the DB is written from the current process only
+                manifest_path: str | None - path to the `ReplayManifest`
+                    file which remembers processed files between runs
+                retry: Iterable[str] - manifest statuses to process again,
+                    for example ('failed', 'filtered')
+                defer_indexes: bool - drop build_order indexes during
+                    the load and create them once at the end
         """
         replay_dir = Path(replay_dir)
         list_file = [p for p in replay_dir.iterdir() if p.suffix == ".SC2Replay"]
+        if manifest_path is not None:
+            self.manifest = ReplayManifest(manifest_path)
+        self._load_known_games()
+        self.stage_timings = {}
+        list_file = self._prescan(list_file, retry)
+        parsed_iter = self._iter_parsed(list_file, filt, workers)
         if self.jupyter in (True, False):
-            bar = alive_it(list_file, force_tty=self.jupyter)
+            bar = alive_it(parsed_iter, total=len(list_file), force_tty=self.jupyter)
         else:
-            bar = alive_it(list_file)
+            bar = alive_it(parsed_iter, total=len(list_file))
 
-        for replay_path in bar:
+        indexes = self.storage.deferred_indexes() if defer_indexes else nullcontext()
+        with indexes:
             try:
-                replay = ReplayData().parse_replay(replay_path)
-            except Exception as exc:
-                msg = f"Replay skipped, reason:\n{exc}"
-                print(msg)
-                self.logger.error(msg)
-                continue
-
-            if filt is not None:
-                if not filt(replay):
-                    info = f"Replay skipped, reason: \nStopped by filter: {filt.report}"
-                    self.logger.info(info)
-                    print(info)
-                    continue
-
-            players_hash = replay.players_hash
-            timestamp_played = int(replay.replay.date.timestamp())
-
-            game_id = self.game_id_if_exists(players_hash, timestamp_played)
-            if game_id is None:
-                self._upload_map_info(replay)
-                self._upload_player_info(replay)
-                id = self._upload_game_info(replay, replay_path)
-                self._upload_build_order(replay, id, bar=bar)
-            else:
-                with self.game_info_db:
-                    self.game_info_db.update_path(game_id, replay_path)
-                info = (
-                    "Replay skipped, reason:\nAlready exists in the db (path updated)"
-                )
-                self.logger.info(info)
-                print(info)
+                for parsed in bar:
+                    bar.text = parsed["replay_path"].name
+                    self._add_timings(parsed["timings"])
+                    self._upload_parsed(parsed)
+            finally:
+                self._flush_pending()
+                self._log_timings()
+                if self.manifest is not None:
+                    self.manifest.close()
+                    self.manifest = None
 
 
 if __name__ == "__main__":
@@ -2,6 +2,9 @@ import cProfile
 import pstats
 from replay_process import ReplayProcess, ReplayFilter
 from datetime import datetime
+from timeit import timeit
+
+from database_access import BuildOrder
 
 
 def get_profile(replays_dir):
@@ -21,3 +24,34 @@ def get_profile(replays_dir):
     stats = pstats.Stats(pr)
     stats.sort_stats(pstats.SortKey.TIME)
     stats.dump_stats('profile.prof')
+
+
+def get_db_benchmark(game_id, tick, number=1000):
+    """
+        Times `BuildOrder.get_by_keys` and `BuildOrder.put` with and
+        without prepared statements. Inserted rows are rolled back.
+        Args:
+            game_id: int - existing game id
+            tick: int - existing tick of this game
+            number: int - calls per measurement
+        Returns:
+            results: dict - seconds per call
+    """
+    db = BuildOrder("./configs/secrets.yml", "configs/database.yml")
+    results = {}
+    for use_prepared in (False, True):
+        db.use_prepared = use_prepared
+        with db:
+            row = dict(db.get_by_keys(game_id, tick))
+            get_time = timeit(lambda: db.get_by_keys(game_id, tick), number=number)
+            new_ticks = iter(range(10**7, 10**7 + number))
+            put_time = timeit(
+                lambda: db.put(**(row | {"tick": next(new_ticks)})), number=number
+            )
+            db.conn.rollback()
+        mode = "prepared" if use_prepared else "plain"
+        results[f"get_by_keys_{mode}"] = get_time / number
+        results[f"put_{mode}"] = put_time / number
+    for name, val in results.items():
+        print(f"{name}: {val * 1000:.3f} ms")
+    return results
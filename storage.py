@@ -0,0 +1,389 @@
+import json
+import sqlite3
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import numpy as np
+
+from config import get_config
+from database_access import (BuildOrder, BuildOrderPacked, GameInfo, MapInfo,
+                             PackedBuildOrderReader, PlayerInfo,
+                             pack_build_order, read_query, transaction,
+                             unpack_build_order)
+from setup_logger import get_logger
+
+
+class Storage:
+    """
+        Storage of the preprocessed replays.
+
+        `ReplayProcess` writes parsed replays into it, `Extractor`
+        reads them through `game_info_db` and `build_order_db`
+        attributes, which are used as `with storage.game_info_db as db:`.
+
+        Implementations:
+            `PostgresStorage` - the `game_info`, `build_order`,
+                                `player_info` and `map_info` tables
+            `LocalStorage` - SQLite file with NumPy blobs, doesn't need Postgres
+    """
+
+    def create_tables(self):
+        raise NotImplementedError
+
+    def deferred_indexes(self):
+        """
+            Returns context manager for bulk loads, build_order indexes
+            are dropped inside of it and created again on exit
+        """
+        return nullcontext()
+
+    def transaction(self):
+        """
+            Returns context manager which writes everything inside of it at once
+        """
+        raise NotImplementedError
+
+    def get_ingested_keys(self):
+        """
+            Returns:
+                games: dict - {(players_hash, timestamp_played): game_id}
+                paths: dict - {replay_path: game_id}
+        """
+        raise NotImplementedError
+
+    def get_game_id(self, players_hash, timestamp_played):
+        raise NotImplementedError
+
+    def put_map(self, map_info):
+        raise NotImplementedError
+
+    def put_players(self, player_info):
+        raise NotImplementedError
+
+    def put_game(self, game_info):
+        """
+            Returns:
+                game_id: int - id of the new game
+        """
+        raise NotImplementedError
+
+    def put_build_order(self, columns, values):
+        """
+            Args:
+                columns: list[str] - column names, the first one is `game_id`
+                values: np.ndarray - (rows, columns) int32 array
+        """
+        raise NotImplementedError
+
+    def update_path(self, game_id, replay_path):
+        raise NotImplementedError
+
+    def delete_game(self, game_id):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PostgresStorage(Storage):
+    """
+        Storage in the PostgreSQL tables (see `database_access`)
+    """
+
+    def __init__(self, secrets_path, db_config_path, packed_build_order=False) -> None:
+        """
+            Args:
+                secrets_path: str - path to the secrets file
+                db_config_path: str - path to the db config
+                packed_build_order: bool - use the `build_order_packed` table
+                    (one row per game) instead of the wide `build_order`
+        """
+        self.game_info_db = GameInfo(secrets_path, db_config_path)
+        if packed_build_order:
+            self.build_order_db = BuildOrderPacked(secrets_path, db_config_path)
+        else:
+            self.build_order_db = BuildOrder(secrets_path, db_config_path)
+        self.player_info_db = PlayerInfo(secrets_path, db_config_path)
+        self.map_info_db = MapInfo(secrets_path, db_config_path)
+        self.dbs = [
+            self.map_info_db,
+            self.player_info_db,
+            self.game_info_db,
+            self.build_order_db,
+        ]
+
+    def create_tables(self):
+        for db in self.dbs:
+            with db:
+                db.create_table()
+                db.create_indexes()
+
+    @contextmanager
+    def deferred_indexes(self):
+        # game_info indexes are kept, they are used to find duplicates
+        with self.build_order_db as db:
+            db.drop_indexes()
+        try:
+            yield
+        finally:
+            with self.build_order_db as db:
+                db.create_indexes()
+
+    def transaction(self):
+        return transaction(*self.dbs)
+
+    def get_ingested_keys(self):
+        with self.game_info_db as db:
+            return db.get_ingested_keys()
+
+    def get_game_id(self, players_hash, timestamp_played):
+        with self.game_info_db as db:
+            return db.get_id_if_exists(players_hash, timestamp_played)
+
+    def put_map(self, map_info):
+        with self.map_info_db as db:
+            db.put(**map_info)
+
+    def put_players(self, player_info):
+        with self.player_info_db as db:
+            db.put_many(player_info)
+
+    def put_game(self, game_info):
+        with self.game_info_db as db:
+            return db.put(**game_info)
+
+    def put_build_order(self, columns, values):
+        with self.build_order_db as db:
+            db.put_array(list(columns), values)
+
+    def update_path(self, game_id, replay_path):
+        with self.game_info_db as db:
+            db.update_path(game_id, replay_path)
+
+    def delete_game(self, game_id):
+        with self.game_info_db as db:
+            db.delete_id(game_id)
+
+
+class LocalGameInfo:
+    """
+        Read access to the `LocalStorage` games,
+        mirrors the `GameInfo` methods used by `Extractor`
+    """
+    def __init__(self, storage) -> None:
+        self.storage = storage
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def _players_info(self, row):
+        end_time, p1r, p1w, p1l, p2r, p2w, p2l = row
+        p1w = bool(p1w) if p1w is not None else None
+        p2w = bool(p2w) if p2w is not None else None
+        return (end_time, p1r, p1w, p1l, p2r, p2w, p2l)
+
+    def iter_ids(self, itersize=None):
+        query = self.storage.get_query("select_ids_file")
+        for row in self.storage.conn.execute(query):
+            yield row[0]
+
+    def get_players_info(self, game_id):
+        query = self.storage.get_query("select_player_file")
+        row = self.storage.conn.execute(query, (game_id,)).fetchone()
+        return self._players_info(row) if row is not None else None
+
+    def iter_candidates(
+        self,
+        player_r,
+        enemy_r,
+        min_league,
+        include_unranked=True,
+        game_ids=None,
+        itersize=None,
+    ):
+        """
+            See `GameInfo.iter_candidates`
+        """
+        query = self.storage.get_query("select_candidates_file")
+        to_pass = {
+            "matchup": f"{player_r}v{enemy_r}",
+            "reverse_matchup": f"{enemy_r}v{player_r}",
+            "player": player_r,
+            "enemy": enemy_r,
+            "min_league": min_league,
+            "include_unranked": include_unranked,
+        }
+        if game_ids is not None:
+            game_ids = set(game_ids)
+        for row in self.storage.conn.execute(query, to_pass):
+            if game_ids is None or row[0] in game_ids:
+                yield (row[0], *self._players_info(row[1:]))
+
+
+class LocalBuildOrder(PackedBuildOrderReader):
+    """
+        Read access to the `LocalStorage` build orders,
+        mirrors the `BuildOrder` methods used by `Extractor`.
+        Rows are dicts with `game_id`, `tick` and the game's columns.
+    """
+
+    def __init__(self, storage) -> None:
+        self.storage = storage
+        self._clear_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def get_games(self, game_ids):
+        return {game_id: self.storage.get_build_order(game_id) for game_id in game_ids}
+
+
+class LocalStorage(Storage):
+    """
+        Storage in a local SQLite file, doesn't need the Postgres DB.
+
+        `game_info`, `player_info` and `map_info` are SQLite tables,
+        the build order of every game is a NumPy array saved
+        as a blob in the `build_order` table.
+    """
+    game_info_columns = (
+        "timestamp_played",
+        "date_processed",
+        "players_hash",
+        "end_time",
+        "player_1_id",
+        "player_1_race",
+        "player_1_winner",
+        "player_1_league",
+        "player_2_id",
+        "player_2_race",
+        "player_2_winner",
+        "player_2_league",
+        "map_hash",
+        "matchup",
+        "is_ladder",
+        "replay_path",
+    )
+
+    def __init__(self, storage_path, db_config_path="./configs/database.yml") -> None:
+        """
+            Args:
+                storage_path: str - path to the SQLite file, created if missing
+                db_config_path: str - path to the db config,
+                    queries are listed in its `local_storage` section
+        """
+        self.db_config = get_config(db_config_path)["local_storage"]
+        self.storage_path = Path(storage_path)
+        self.logger = get_logger(__name__)
+        self.conn = sqlite3.connect(self.storage_path)
+        self._in_transaction = False
+        self.game_info_db = LocalGameInfo(self)
+        self.build_order_db = LocalBuildOrder(self)
+
+    def get_query(self, name):
+        """
+            Returns the query text by its key in the `local_storage` config
+        """
+        return read_query(self.db_config[name])
+
+    def _commit(self):
+        if not self._in_transaction:
+            self.conn.commit()
+
+    def create_tables(self):
+        self.conn.executescript(self.get_query("create_tables_file"))
+        self.conn.commit()
+
+    @contextmanager
+    def transaction(self):
+        self._in_transaction = True
+        try:
+            with self.conn:
+                yield
+        finally:
+            self._in_transaction = False
+
+    def get_ingested_keys(self):
+        query = self.get_query("select_keys_file")
+        games = {}
+        paths = {}
+        for game_id, players_hash, timestamp_played, replay_path in self.conn.execute(
+            query
+        ):
+            games[(players_hash, timestamp_played)] = game_id
+            if replay_path is not None:
+                paths[replay_path] = game_id
+        return games, paths
+
+    def get_game_id(self, players_hash, timestamp_played):
+        query = self.get_query("select_game_id_file")
+        row = self.conn.execute(query, (players_hash, timestamp_played)).fetchone()
+        return row[0] if row is not None else None
+
+    def put_map(self, map_info):
+        # Same rows and merge rules as `MapInfo.put`, dates are ISO strings
+        rows = [
+            [map_hash, map_name, matchup_type, game_date.isoformat()]
+            for map_hash, map_name, matchup_type, game_date in MapInfo.aggregate(
+                [map_info]
+            )
+        ]
+        self.conn.executemany(self.get_query("upsert_map_file"), rows)
+        self._commit()
+
+    def put_players(self, player_info):
+        rows = PlayerInfo.aggregate(player_info)
+        self.conn.executemany(self.get_query("upsert_player_file"), rows)
+        self._commit()
+
+    def put_game(self, game_info):
+        to_pass = {col: game_info[col] for col in self.game_info_columns}
+        to_pass["date_processed"] = str(to_pass["date_processed"])
+        cur = self.conn.execute(self.get_query("insert_game_file"), to_pass)
+        self._commit()
+        return cur.lastrowid
+
+    def put_build_order(self, columns, values):
+        columns = list(columns)
+        game_ids = values[:, 0]
+        to_insert = []
+        for game_id in np.unique(game_ids).tolist():
+            data = pack_build_order(values[game_ids == game_id, 1:])
+            to_insert.append((game_id, json.dumps(columns[1:]), data))
+        self.conn.executemany(self.get_query("upsert_build_order_file"), to_insert)
+        self._commit()
+        self.build_order_db._clear_cache()
+        self.logger.info(f"{len(values)} build_order rows saved")
+
+    def get_build_order(self, game_id):
+        """
+            Returns:
+                columns: list[str] - column names, the first one is `tick`
+                values: np.ndarray - (ticks, columns) int32 array
+        """
+        query = self.get_query("select_build_order_file")
+        row = self.conn.execute(query, (game_id,)).fetchone()
+        if row is None:
+            return ["tick"], np.empty((0, 1), dtype=np.int32)
+        return unpack_build_order(json.loads(row[0]), row[1])
+
+    def update_path(self, game_id, replay_path):
+        self.conn.execute(
+            self.get_query("update_path_file"), (str(replay_path), game_id)
+        )
+        self._commit()
+
+    def delete_game(self, game_id):
+        self.conn.execute(self.get_query("delete_build_order_file"), (game_id,))
+        self.conn.execute(self.get_query("delete_game_file"), (game_id,))
+        self._commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+import game_catalog
+from game_catalog import get_catalog
+
+
+@pytest.fixture()
+def data_files(tmp_path):
+    game_info_file = tmp_path / "game_info.csv"
+    game_info_file.write_text("name,type,race\nDrone,Unit,Zerg\n")
+    supply_data_file = tmp_path / "supply_data.csv"
+    supply_data_file.write_text("name,supply\nDrone,1\n")
+    return str(game_info_file), str(supply_data_file)
+
+
+# Test case 1
+def test_files_are_read_once(data_files, monkeypatch):
+    read_files = []
+    read_csv = game_catalog.pd.read_csv
+
+    def counting_read_csv(path, **kwargs):
+        read_files.append(path)
+        return read_csv(path, **kwargs)
+
+    monkeypatch.setattr(game_catalog.pd, "read_csv", counting_read_csv)
+    game_info_file, supply_data_file = data_files
+    # Same pairs as ReplayParser, NormalizeColumns and DensityVals
+    get_catalog(game_info_file)
+    catalog = get_catalog(game_info_file, supply_data_file)
+    get_catalog(supply_data_file=supply_data_file)
+
+    assert len(read_files) == 2
+    assert catalog.types["Drone"] == "Unit"
+    assert catalog.supply_lower["drone"] == 1.0
@@ -0,0 +1,75 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sc2reader")
+pytest.importorskip("starcraft2_replay_parse")
+
+import replay_process
+from replay_process import ReplayFilter
+
+
+def make_header(races=("Zerg", "Terran"), real_type="1v1"):
+    teams = [
+        SimpleNamespace(players=[SimpleNamespace(play_race=race)]) for race in races
+    ]
+    return SimpleNamespace(
+        is_ladder=True,
+        date=datetime(2022, 5, 1),
+        real_type=real_type,
+        teams=teams,
+        frames=20000,
+    )
+
+
+@pytest.fixture()
+def load_header(monkeypatch):
+    calls = []
+
+    def set_header(header):
+        def load_replay(path, load_level):
+            calls.append(load_level)
+            return header
+
+        monkeypatch.setattr(replay_process.sc2reader, "load_replay", load_replay)
+        return calls
+
+    return set_header
+
+
+# Test case 1
+def test_header_loads_players(load_header):
+    calls = load_header(make_header())
+    replay_dict = ReplayFilter().get_header_dict("game.SC2Replay")
+    # Players are loaded by sc2reader starting from level 2
+    assert calls == [2]
+    assert replay_dict["mode"] == "1v1"
+    assert replay_dict["matchup"] == "ZvT"
+
+
+# Test case 2
+def test_header_filters_pass(load_header):
+    load_header(make_header(races=("Terran", "Zerg")))
+    replay_filter = ReplayFilter()
+    replay_filter.is_1v1 = True
+    replay_filter.has_race = "z"
+    replay_filter.matchup = "ZvT"
+    assert replay_filter.check_header("game.SC2Replay")
+
+
+# Test case 3
+@pytest.mark.parametrize(
+    "races, real_type, name, val",
+    [
+        (("Zerg", "Terran", "Protoss"), "FFA", "is_1v1", True),
+        (("Zerg", "Terran"), "1v1", "has_race", "p"),
+        (("Zerg", "Terran"), "1v1", "matchup", "ZvP"),
+    ],
+)
+def test_header_filters_fail(load_header, races, real_type, name, val):
+    load_header(make_header(races, real_type))
+    replay_filter = ReplayFilter()
+    setattr(replay_filter, name, val)
+    assert getattr(replay_filter, name) == val
+    assert not replay_filter.check_header("game.SC2Replay")
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+from replay_manifest import ReplayManifest, file_hash
+
+
+@pytest.fixture()
+def replay_file(tmp_path):
+    replay_path = tmp_path / "game.SC2Replay"
+    replay_path.write_bytes(b"replay data")
+    return replay_path
+
+
+@pytest.fixture()
+def manifest(tmp_path):
+    with ReplayManifest(tmp_path / "manifest.db") as manifest:
+        yield manifest
+
+
+# Test case 1
+def test_new_file_needs_processing(manifest, replay_file):
+    assert not manifest.is_recorded(replay_file)
+    assert manifest.needs_processing(replay_file)
+
+
+# Test case 2
+def test_recorded_file_is_skipped(manifest, replay_file):
+    manifest.add(replay_file, "done", game_id=1)
+    assert manifest.is_recorded(replay_file)
+    assert not manifest.needs_processing(replay_file)
+
+
+# Test case 3
+def test_touched_file_is_skipped(manifest, replay_file):
+    manifest.add(replay_file, "done", game_id=1, content_hash=file_hash(replay_file))
+    stat = replay_file.stat()
+    os.utime(replay_file, (stat.st_atime, stat.st_mtime + 10))
+    assert not manifest.needs_processing(replay_file)
+    # The new modification time is remembered
+    record = manifest.files[str(replay_file.resolve())]
+    assert record["mtime"] == replay_file.stat().st_mtime
+
+
+# Test case 4
+def test_changed_file_needs_processing(manifest, replay_file):
+    manifest.add(replay_file, "done", game_id=1, content_hash=file_hash(replay_file))
+    replay_file.write_bytes(b"another replay")
+    assert manifest.needs_processing(replay_file)
+    assert manifest.is_recorded(replay_file)
+
+
+# Test case 5
+def test_touched_file_without_hash(manifest, replay_file):
+    manifest.add(replay_file, "done", game_id=1)
+    assert manifest.files[str(replay_file.resolve())]["content_hash"] is None
+    assert not manifest.needs_processing(replay_file)
+    stat = replay_file.stat()
+    os.utime(replay_file, (stat.st_atime, stat.st_mtime + 10))
+    # The old content is unknown, so the file is processed again
+    assert manifest.needs_processing(replay_file)
+
+
+# Test case 6
+def test_retry_statuses(manifest, replay_file):
+    manifest.add(replay_file, "failed", report="can't parse")
+    assert not manifest.needs_processing(replay_file)
+    assert manifest.needs_processing(replay_file, retry=("failed",))
+
+
+# Test case 7
+def test_records_are_saved(tmp_path, replay_file):
+    manifest_path = tmp_path / "manifest.db"
+    with ReplayManifest(manifest_path) as manifest:
+        manifest.add(
+            replay_file,
+            "filtered",
+            report="not 1v1",
+            content_hash=file_hash(replay_file),
+        )
+    with ReplayManifest(manifest_path) as manifest:
+        record = manifest.files[str(replay_file.resolve())]
+        assert record["status"] == "filtered"
+        assert record["report"] == "not 1v1"
+        assert record["content_hash"] == file_hash(replay_file)
+        assert manifest.get_paths("filtered") == [replay_file.resolve()]
+        assert manifest.summary() == {"filtered": 1}
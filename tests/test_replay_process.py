@@ -0,0 +1,67 @@
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("sc2reader")
+pytest.importorskip("starcraft2_replay_parse")
+
+import replay_process
+from replay_process import ReplayProcess
+from storage import LocalStorage
+
+
+def make_game(replay_path):
+    return {
+        "timestamp_played": 1001,
+        "date_processed": datetime(2022, 5, 1),
+        "players_hash": "hash",
+        "end_time": 600,
+        "player_1_id": 1,
+        "player_1_race": "z",
+        "player_1_winner": True,
+        "player_1_league": 4,
+        "player_2_id": 2,
+        "player_2_race": "t",
+        "player_2_winner": False,
+        "player_2_league": 3,
+        "map_hash": "map",
+        "matchup": "ZvT",
+        "is_ladder": True,
+        "replay_path": replay_path,
+    }
+
+
+@pytest.fixture()
+def process(tmp_path, monkeypatch):
+    # The parser isn't used, the replays are "parsed" by the tests
+    monkeypatch.setattr(replay_process, "ReplayParser", lambda *args: None)
+    storage = LocalStorage(tmp_path / "storage.db")
+    process = ReplayProcess(None, None, None, storage=storage)
+    yield process
+    storage.close()
+
+
+# Test case 1
+def test_prescan_skips_updated_path(process, tmp_path):
+    (tmp_path / "replays").mkdir()
+    old_path = tmp_path / "old.SC2Replay"
+    # The queries are read by relative paths, so the working directory stays
+    new_path = Path(os.path.relpath(tmp_path / "replays" / "new.SC2Replay"))
+    new_path.touch()
+    process.storage.put_game(make_game(str(old_path)))
+    process._load_known_games()
+
+    # The same game found at a relative path
+    process._upload_parsed(
+        {
+            "status": "ok",
+            "replay_path": new_path,
+            "players_hash": "hash",
+            "timestamp_played": 1001,
+        }
+    )
+
+    process._load_known_games()
+    assert process._prescan([new_path]) == []
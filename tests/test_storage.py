@@ -0,0 +1,143 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from storage import LocalStorage
+
+
+def make_game(num, players_hash="hash", replay_path="game.SC2Replay"):
+    return {
+        "timestamp_played": 1000 + num,
+        "date_processed": datetime(2022, 5, 1),
+        "players_hash": players_hash,
+        "end_time": 600,
+        "player_1_id": 1,
+        "player_1_race": "z",
+        "player_1_winner": True,
+        "player_1_league": 4,
+        "player_2_id": 2,
+        "player_2_race": "t",
+        "player_2_winner": False,
+        "player_2_league": 3,
+        "map_hash": "map",
+        "matchup": "ZvT",
+        "is_ladder": True,
+        "replay_path": replay_path,
+    }
+
+
+def make_players(p1_race="z", p1_league=4):
+    return [
+        {
+            "player_id": 1,
+            "nickname": "first",
+            "race": p1_race,
+            "league_int": p1_league,
+            "is_win": True,
+        },
+        {
+            "player_id": 2,
+            "nickname": "second",
+            "race": "t",
+            "league_int": 3,
+            "is_win": False,
+        },
+    ]
+
+
+@pytest.fixture()
+def storage(tmp_path):
+    storage = LocalStorage(tmp_path / "storage.db")
+    storage.create_tables()
+    yield storage
+    storage.close()
+
+
+# Test case 1
+def test_game_round_trip(storage):
+    game_id = storage.put_game(make_game(1))
+    assert storage.get_game_id("hash", 1001) == game_id
+    assert storage.get_game_id("hash", 1002) is None
+    games, paths = storage.get_ingested_keys()
+    assert games == {("hash", 1001): game_id}
+    assert paths == {"game.SC2Replay": game_id}
+
+    storage.update_path(game_id, "other.SC2Replay")
+    _, paths = storage.get_ingested_keys()
+    assert paths == {"other.SC2Replay": game_id}
+
+    with storage.game_info_db as db:
+        assert list(db.iter_ids()) == [game_id]
+        assert db.get_players_info(game_id) == (600, "z", True, 4, "t", False, 3)
+
+
+# Test case 2
+def test_build_order_round_trip(storage):
+    game_ids = [storage.put_game(make_game(num)) for num in range(2)]
+    columns = ["game_id", "tick", "player_1_unit_drone"]
+    values = np.array(
+        [
+            [game_ids[0], 0, 12],
+            [game_ids[0], 16, 13],
+            [game_ids[1], 0, 12],
+        ],
+        dtype=np.int32,
+    )
+    storage.put_build_order(columns, values)
+    game_columns, game_values = storage.get_build_order(game_ids[0])
+    assert game_columns == ["tick", "player_1_unit_drone"]
+    np.testing.assert_array_equal(game_values, values[:2, 1:])
+
+    with storage.build_order_db as db:
+        rows = db.get_by_ticks(game_ids[0], [16])
+        assert rows == [{"game_id": game_ids[0], "tick": 16, "player_1_unit_drone": 13}]
+        rows = db.get_by_game_ticks([(game_ids[0], 0), (game_ids[1], 0)])
+        assert sorted(row["game_id"] for row in rows) == game_ids
+
+
+# Test case 3
+def test_delete_game(storage):
+    game_id = storage.put_game(make_game(1))
+    storage.put_build_order(
+        ["game_id", "tick"], np.array([[game_id, 0]], dtype=np.int32)
+    )
+    storage.delete_game(game_id)
+    assert storage.get_game_id("hash", 1001) is None
+    _, values = storage.get_build_order(game_id)
+    assert len(values) == 0
+
+
+# Test case 4
+def test_players_are_summed(storage):
+    storage.put_players(make_players())
+    storage.put_players(make_players(p1_race="p", p1_league=2))
+    storage.put_players(make_players(p1_race="p", p1_league=2))
+    row = storage.conn.execute(
+        "SELECT games_played, zerg_played, protoss_played, wins, loses, "
+        "most_played_race, highest_league FROM player_info WHERE player_id = 1"
+    ).fetchone()
+    assert row == (3, 1, 2, 3, 0, "p", 4)
+
+
+# Test case 5
+def test_map_keeps_latest_date(storage):
+    map_info = {
+        "map_hash": "map",
+        "map_name": "Map",
+        "matchup_type": "1v1",
+        "game_date": datetime(2022, 5, 1),
+    }
+    storage.put_map(map_info)
+    storage.put_map(map_info | {"game_date": datetime(2021, 5, 1)})
+    rows = storage.conn.execute("SELECT * FROM map_info").fetchall()
+    assert rows == [("map", "Map", "1v1", "2022-05-01")]
+
+
+# Test case 6
+def test_transaction_rolls_back(storage):
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.put_game(make_game(1))
+            raise RuntimeError("upload failed")
+    assert storage.get_game_id("hash", 1001) is None
@@ -0,0 +1,191 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sc2reader")
+pytest.importorskip("starcraft2_replay_parse")
+pytest.importorskip("alive_progress")
+
+from training_data import (CalcWinprob, DensityVals, NormalizeColumns,
+                           RandomPoints)
+
+# create test data
+GAME_INFO = \
+    '''name,type,race
+Drone,Unit,Zerg
+Zergling,Unit,Zerg
+Hatchery,Building,Zerg
+Burrow,Upgrade,Zerg
+Marine,Unit,Terran
+Barracks,Building,Terran
+Stimpack,Upgrade,Terran
+'''
+SUPPLY_DATA = \
+    '''name,supply
+drone,1
+zergling,0.5
+marine,1
+'''
+NAMES = ["drone", "zergling", "hatchery", "burrow", "marine", "barracks", "stimpack"]
+TYPES = ["unit", "unit", "building", "upgrade", "unit", "building", "upgrade"]
+
+
+@pytest.fixture()
+def data_files(tmp_path):
+    game_info_file = tmp_path / "game_info.csv"
+    game_info_file.write_text(GAME_INFO)
+    supply_data_file = tmp_path / "supply_data.csv"
+    supply_data_file.write_text(SUPPLY_DATA)
+    return str(game_info_file), str(supply_data_file)
+
+
+def make_row(seed):
+    rng = random.Random(seed)
+    row = {"game_id": 1, "tick": 320}
+    for player in ("player_1", "player_2"):
+        for name, val_type in zip(NAMES, TYPES):
+            row[f"{player}_{val_type}_{name}"] = rng.randint(0, 20)
+        row[f"{player}_special_minerals_available"] = rng.randint(0, 500)
+    return row
+
+
+def reference_filter(data, game_info_file, supply_data_file, player, race, **kwargs):
+    # Filter of NormalizeColumns before the compiled plans
+    game_info = pd.read_csv(game_info_file, index_col="name").rename(index=str.lower)
+    supply_data = pd.read_csv(supply_data_file, index_col="name")
+    df = game_info[game_info["race"] == race]
+    if not kwargs.get("include_units", True):
+        df = df[df["type"] != "Unit"]
+    if not kwargs.get("include_buildings", False):
+        df = df[df["type"] != "Building"]
+    if not kwargs.get("include_upgrades", False):
+        df = df[df["type"] != "Upgrade"]
+    allowed = list(df.index)
+    if kwargs.get("include_tick", False):
+        allowed.append("tick")
+    if kwargs.get("include_special", False):
+        allowed += NormalizeColumns.special_names
+    out = {}
+    for column, val in data.items():
+        if player not in column:
+            continue
+        name = column.removeprefix(player + "_")
+        for prefix in NormalizeColumns.type_prefixes:
+            name = name.removeprefix(prefix)
+        if name not in allowed:
+            continue
+        if name in supply_data.index:
+            val *= supply_data.loc[name, "supply"]
+        out[name] = val
+    return out
+
+
+# Test case 1
+def test_random_points_do_not_depend_on_order():
+    game_ids = [5, 7, 11, 13]
+    end_vals = [9600, 19200, 12800, 28800]
+    points = RandomPoints(960, 480, True, 960, 16, seed=42)
+    forward = {
+        game_id: points.transform(end_val, game_id)
+        for game_id, end_val in zip(game_ids, end_vals)
+    }
+    points = RandomPoints(960, 480, True, 960, 16, seed=42)
+    backward = {
+        game_id: points.transform(end_val, game_id)
+        for game_id, end_val in reversed(list(zip(game_ids, end_vals)))
+    }
+    assert forward == backward
+    assert forward[5] != forward[7]
+
+
+# Test case 2
+@pytest.mark.parametrize("get_final_point", [True, False])
+def test_random_points_batch(get_final_point):
+    # Short games get the worst case point, long ones need more draws
+    game_ids = [5, 7, 11, 13, 17]
+    end_vals = [9600, 19200, 12800, 100, 28800]
+    points = RandomPoints(960, 480, get_final_point, 960, 16, seed=3)
+    single = [
+        points.transform(end_val, game_id)
+        for game_id, end_val in zip(game_ids, end_vals)
+    ]
+    assert points.transform_batch(end_vals, game_ids) == single
+    # Another seed gives other points
+    points.reseed(4)
+    assert points.transform_batch(end_vals, game_ids) != single
+
+
+# Test case 3
+def test_random_points_range():
+    points = RandomPoints(960, 480, True, 960, 16, seed=1)
+    starting_ticks, final_ticks = points.transform(19200, game_id=1)
+    assert len(starting_ticks) == len(final_ticks)
+    for start, final in zip(starting_ticks, final_ticks):
+        assert start % 16 == 0 and final % 16 == 0
+        assert start < final <= 19200
+
+
+# Test case 4
+@pytest.mark.parametrize(
+    "player, r, kwargs",
+    [
+        ("player_1", "z", {}),
+        ("player_2", "t", {"include_buildings": True, "include_upgrades": True}),
+        ("player_1", "z", {"include_buildings": True, "include_special": True}),
+        ("player_2", "z", {"include_units": False, "include_buildings": True}),
+        ("player_1", "t", {"include_tick": True}),
+    ],
+)
+def test_normalize_plan_matches_reference(data_files, player, r, kwargs):
+    normalize = NormalizeColumns(*data_files)
+    for seed in range(3):
+        row = make_row(seed)
+        normalize.setup_filter(player, r, **kwargs)
+        expected = reference_filter(
+            row, *data_files, player, NormalizeColumns.game_race_dict[r], **kwargs
+        )
+        assert normalize.transform(row) == expected
+
+
+# Test case 5
+def test_normalize_required_columns(data_files):
+    normalize = NormalizeColumns(*data_files)
+    columns = list(make_row(0))
+    normalize.setup_filter("player_2", "z", include_buildings=True)
+    assert normalize.get_required_columns(columns) == [
+        "player_2_unit_drone",
+        "player_2_unit_zergling",
+        "player_2_building_hatchery",
+    ]
+
+
+# Test case 6
+def test_winprob_batch_matches_single():
+    winprob = CalcWinprob(delay=5)
+    final_ticks = [960, 4800, 9600]
+    for is_win in (True, False):
+        batch = winprob.transform_batch(final_ticks, is_win, 9600)
+        single = [winprob.transform(tick, is_win, 9600) for tick in final_ticks]
+        np.testing.assert_allclose(batch, single)
+
+
+# Test case 7
+@pytest.mark.parametrize("reducer", ["avg", "softmax"])
+def test_density_batch_matches_dict(data_files, reducer):
+    dense = DensityVals(data_files[1], reducer)
+    columns = ["drone", "zergling", "hatchery", "minerals_available"]
+    rng = np.random.default_rng(0)
+    start = rng.integers(0, 10, (5, len(columns))).astype(np.float64)
+    end = rng.integers(0, 10, (5, len(columns))).astype(np.float64)
+
+    diff_batch = dense.transform_diff_batch(columns, start, end)
+    single_batch = dense.transform_single_batch(columns, start)
+    for num in range(len(start)):
+        start_dict = dict(zip(columns, start[num].tolist()))
+        end_dict = dict(zip(columns, end[num].tolist()))
+        diff_dict = dense.transform_diff(start_dict, end_dict)
+        single_dict = dense.transform_single(dict(start_dict))
+        np.testing.assert_allclose(diff_batch[num], list(diff_dict.values()))
+        np.testing.assert_allclose(single_batch[num], list(single_dict.values()))
@@ -1,11 +1,12 @@
 from math import exp
+from operator import itemgetter
 from pathlib import Path
-from random import gauss
 
-import pandas as pd
+import numpy as np
 from psycopg2 import ProgrammingError
 
 from database_access import MatchupDB
+from game_catalog import get_catalog
 from replay_process import ReplayFilter
 
 
@@ -79,8 +80,21 @@ class ReorganizePlayers:
 
 
 class RandomPoints:
+    """
+        Samples random points of a game.
+
+        If `seed` is set, points of a game are drawn from a generator
+        seeded with (seed, game_id), so they don't depend on the order
+        of the games or on the process which handles them.
+    """
     def __init__(
-        self, mean_step, sigma, get_final_point: bool, final_point_step, tick_step
+        self,
+        mean_step,
+        sigma,
+        get_final_point: bool,
+        final_point_step,
+        tick_step,
+        seed=None,
     ) -> None:
         """
             Args:
@@ -89,6 +103,7 @@ class RandomPoints:
                 get_final_point: bool - Whether to include a final point or not.
                 final_point_step: int - Distance between the current point and the next point.
                 tick_step: int - Game tick step size, defined earlier.
+                seed: int | None - Seed of the run, None for random.
         """
         self.mean_step = mean_step
         self.sigma = sigma
@@ -96,6 +111,31 @@ class RandomPoints:
         self.final_point_step = final_point_step
         self.tick_step = tick_step
         self.final_point_pos = self._from_tick(final_point_step)
+        self.reseed(seed)
+
+    def reseed(self, seed):
+        """
+            Restarts the random generator with a new seed.
+
+            Args:
+                seed: int | None - Seed of the run.
+        """
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def get_rng(self, game_id=None):
+        """
+            Returns the random generator of the game.
+
+            Args:
+                game_id: int | None - Game id, None uses the shared generator.
+
+            Returns:
+                np.random.Generator
+        """
+        if self.seed is None or game_id is None:
+            return self.rng
+        return np.random.default_rng([self.seed, game_id])
 
     def _to_tick(self, val):
         return int(val) * self.tick_step
@@ -103,26 +143,39 @@ class RandomPoints:
     def _from_tick(self, val):
         return val // self.tick_step
 
-    def get_random_ticks(self, end_val):
+    def get_random_ticks(self, end_val, rng=None):
         """
             Gets random ticks.
+            Steps are drawn in chunks, each chunk covers the rest
+            of the game on average.
 
             Args:
                 end_val: int - End value of the range.
+                rng: np.random.Generator | None - Generator, see `get_rng`.
 
             Returns:
                 list[int] - List of random ticks.
         """
+        rng = self.rng if rng is None else rng
         end_pos = self._from_tick(end_val)
-        out_pos = 0
-        out_list = []
         end_pos = (
             end_pos if not self.get_final_point else end_pos - self.final_point_pos
         )
-        out_pos += self._from_tick(gauss(self.mean_step, self.sigma)) // 2
+        mean_pos = max(self._from_tick(self.mean_step), 1)
+        out_pos = self._from_tick(rng.normal(self.mean_step, self.sigma)) // 2
+        out_list = []
         while out_pos < end_pos:
-            out_list.append(out_pos)
-            out_pos += self._from_tick(gauss(self.mean_step, self.sigma))
+            size = int((end_pos - out_pos) // mean_pos) + 2
+            steps = np.floor_divide(
+                rng.normal(self.mean_step, self.sigma, size), self.tick_step
+            )
+            positions = out_pos + np.concatenate(([0.0], np.cumsum(steps)))
+            reached = np.flatnonzero(positions >= end_pos)
+            if reached.size:
+                out_list.extend(positions[: reached[0]].tolist())
+                break
+            out_list.extend(positions[:-1].tolist())
+            out_pos = positions[-1]
 
         worst_case_val = [end_pos // 2]
         return out_list if out_list else worst_case_val
@@ -136,28 +189,113 @@ class RandomPoints:
             Returns:
                 list[int] - List of final points.
         """
-        final_points = []
-        if self.get_final_point:
-            for point in starting_points:
-                final_point = point + self.final_point_pos
-                final_point = min(final_point, self._from_tick(end_val))
-                final_points.append(final_point)
-        return final_points
+        if not self.get_final_point:
+            return []
+        final_points = np.minimum(
+            np.asarray(starting_points) + self.final_point_pos,
+            self._from_tick(end_val),
+        )
+        return final_points.tolist()
 
-    def transform(self, end_val):
+    def transform(self, end_val, game_id=None):
         """
             Args:
                 end_val: int - End value of the range.
+                game_id: int | None - Game id, used to seed the points.
 
             Returns:
                 tuple[list[int], list[int]] - Tuple of random ticks and final points.
         """
-        out_points = self.get_random_ticks(end_val)
+        out_points = self.get_random_ticks(end_val, self.get_rng(game_id))
         final_points = self.get_final_points(out_points, end_val)
         out_ticks = [self._to_tick(p) for p in out_points]
         final_ticks = [self._to_tick(p) for p in final_points]
         return (out_ticks, final_ticks)
 
+    def _draw_steps(self, rngs, shape):
+        """
+            Draws normal steps for every game of the batch.
+
+            Args:
+                rngs: list[np.random.Generator] | None - Generator of each game,
+                    None draws all the rows from the shared generator.
+                shape: tuple[int, int] - (games, steps).
+
+            Returns:
+                np.ndarray - (games, steps) array.
+        """
+        if rngs is None:
+            return self.rng.normal(self.mean_step, self.sigma, shape)
+        return np.stack(
+            [rng.normal(self.mean_step, self.sigma, shape[1]) for rng in rngs]
+        )
+
+    def transform_batch(self, end_vals, game_ids=None):
+        """
+            Samples points of many games with array operations.
+            Each game uses the same stream of its generator as
+            `transform`, so seeded points are the same.
+
+            Args:
+                end_vals: Sequence[int] - End values of the games.
+                game_ids: Sequence[int] | None - Game ids, used to seed the points.
+
+            Returns:
+                list[tuple[list[int], list[int]]] - `transform` output of each game.
+        """
+        if len(end_vals) == 0:
+            return []
+        end_ticks = self._from_tick(np.asarray(end_vals, dtype=np.int64))
+        end_pos = end_ticks
+        if self.get_final_point:
+            end_pos = end_pos - self.final_point_pos
+        rngs = None
+        if self.seed is not None and game_ids is not None:
+            # One generator per game, built once for the batch
+            rngs = [self.get_rng(game_id) for game_id in game_ids]
+        mean_pos = max(self._from_tick(self.mean_step), 1)
+        size = max(int(end_pos.max() // mean_pos) + 3, 2)
+
+        # The first value is the starting point, the rest are steps
+        draws = self._draw_steps(rngs, (len(end_pos), size))
+        while True:
+            start = np.floor_divide(draws[:, :1], self.tick_step) // 2
+            steps = np.floor_divide(draws[:, 1:-1], self.tick_step)
+            positions = start + np.concatenate(
+                (np.zeros_like(start), np.cumsum(steps, axis=1)), axis=1
+            )
+            reached = positions >= end_pos[:, None]
+            if reached.any(axis=1).all():
+                break
+            # Some games are longer than the drawn steps, continue the streams
+            draws = np.concatenate(
+                (draws, self._draw_steps(rngs, (len(end_pos), size))), axis=1
+            )
+
+        first_reached = reached.argmax(axis=1)
+        final_positions = np.minimum(
+            positions + self.final_point_pos, end_ticks[:, None]
+        )
+        out = []
+        for num, stop in enumerate(first_reached.tolist()):
+            if stop:
+                out_points = positions[num, :stop]
+                final_points = final_positions[num, :stop]
+            else:
+                # Same as the worst case of `get_random_ticks`
+                out_points = np.array([end_pos[num] // 2])
+                final_points = np.minimum(
+                    out_points + self.final_point_pos, end_ticks[num]
+                )
+            out_ticks = (out_points.astype(np.int64) * self.tick_step).tolist()
+            final_ticks = []
+            if self.get_final_point:
+                final_ticks = (
+                    final_points.astype(np.int64) * self.tick_step
+                ).tolist()
+            out.append((out_ticks, final_ticks))
+        return out
+
 
 class NormalizeColumns:
     game_race_dict = {
@@ -169,6 +307,7 @@ class NormalizeColumns:
         "minerals_available",
         "vespene_available",
     ]
+    type_prefixes = ("upgrade_", "building_", "special_", "unit_")
 
     def __init__(self, game_info_file, supply_data_file) -> None:
         """
@@ -176,9 +315,11 @@ class NormalizeColumns:
                 game_info_file: str - path to game_info.csv
                 supply_data_file: str - path to supply_data_file.csv
         """
-        self.supply_data = pd.read_csv(supply_data_file, index_col="name")
-        self.game_info = pd.read_csv(game_info_file, index_col="name")
-        self.game_info = self.game_info.rename(index=str.lower)
+        self.catalog = get_catalog(game_info_file, supply_data_file)
+        # {filter_key: set of allowed names}
+        self._allowed_names = {}
+        # {(filter_key, columns): FilterPlan}
+        self._plans = {}
 
     def setup_filter(
         self,
@@ -197,6 +338,85 @@ class NormalizeColumns:
         self.include_special = include_special
         self.include_tick = include_tick
         self.include_units = include_units
+        self.filter_key = (
+            player,
+            self.r,
+            include_buildings,
+            include_upgrades,
+            include_special,
+            include_tick,
+            include_units,
+        )
+
+    def _get_allowed_names(self):
+        if self.filter_key not in self._allowed_names:
+            excluded_types = set()
+            if not self.include_units:
+                excluded_types.add("Unit")
+            if not self.include_buildings:
+                excluded_types.add("Building")
+            if not self.include_upgrades:
+                excluded_types.add("Upgrade")
+            names = {
+                name.lower()
+                for name, race in self.catalog.races.items()
+                if race == self.r and self.catalog.types[name] not in excluded_types
+            }
+            if self.include_tick:
+                names.add("tick")
+            if self.include_special:
+                names.update(self.special_names)
+            self._allowed_names[self.filter_key] = names
+        return self._allowed_names[self.filter_key]
+
+    def _strip_column(self, column):
+        # player_1_unit_Drone ==> unit_Drone
+        name = column.removeprefix(self.player + "_")
+        # unit_Drone ==> Drone
+        for prefix in self.type_prefixes:
+            name = name.removeprefix(prefix)
+        return name
+
+    def get_plan(self, columns):
+        """
+            Returns the compiled filter for the current `setup_filter`
+            arguments and the source columns. Plans are cached.
+            Args:
+                columns: tuple[str] - source column names in their order
+            Returns:
+                plan: FilterPlan
+        """
+        plan_key = (self.filter_key, columns)
+        if plan_key not in self._plans:
+            allowed = self._get_allowed_names()
+            positions = []
+            names = []
+            multipliers = []
+            for i, column in enumerate(columns):
+                # Pass if player_1 in player_1_unit_Drone
+                if self.player not in column:
+                    continue
+                name = self._strip_column(column)
+                # Pass if Drone in zerg units
+                if name not in allowed:
+                    continue
+                positions.append(i)
+                names.append(name)
+                multipliers.append(self.catalog.supply.get(name))
+            self._plans[plan_key] = FilterPlan(positions, names, multipliers)
+        return self._plans[plan_key]
+
+    def get_required_columns(self, columns):
+        """
+            Returns the source columns used by the current `setup_filter`
+            arguments, pass them to `Extractor.select_columns`
+            Args:
+                columns: Sequence[str] - build_order table columns
+            Returns:
+                required: list[str] - columns in the order of `columns`
+        """
+        plan = self.get_plan(tuple(columns))
+        return [columns[i] for i in plan.positions]
 
     def filter_columns(self, data):
         """
@@ -207,57 +427,16 @@ class NormalizeColumns:
             Returns:
                 data: dict - filtered build_order data
         """
-
-        # ("player_N_column", int_val)
-        pairs = list(data.items())
-        # Example:
-        # Pass if player_1 in player_1_unit_Drone
-        pairs = [pair for pair in pairs if self.player in pair[0]]
-        # player_1_unit_Drone ==> unit_Drone
-        pairs = [(pair[0].removeprefix(self.player + "_"), pair[1]) for pair in pairs]
-        # unit_Drone ==> Drone
-        for prefix in ("upgrade_", "building_", "special_", "unit_"):
-            pairs = [(pair[0].removeprefix(prefix), pair[1]) for pair in pairs]
-        # Pass if Drone in zerg units
-        df = self._filter_race(self.game_info, self.r)
-        if not self.include_units:
-            df = self._filter_units(df)
-        if not self.include_buildings:
-            df = self._filter_buildings(df)
-        if not self.include_upgrades:
-            df = self._filter_upgrades(df)
-        ind_list = list(df.index)
-        if self.include_tick:
-            ind_list += ["tick"]
-        if self.include_special:
-            ind_list += self.special_names
-        pairs = [pair for pair in pairs if pair[0] in ind_list]
-        # ("Zergling", 4) ==> ("Zergling", 2)
-        pairs = [self.normalize_units(*pair) for pair in pairs]
-        return dict(pairs)
-
-    def _filter_race(self, df, race):
-        df = df[df.loc[:, "race"] == race]
-        return df
-
-    def _filter_units(self, df):
-        df = df[df.loc[:, "type"] != "Unit"]
-        return df
-
-    def _filter_upgrades(self, df):
-        df = df[df.loc[:, "type"] != "Upgrade"]
-        return df
-
-    def _filter_buildings(self, df):
-        df = df[df.loc[:, "type"] != "Building"]
-        return df
+        plan = self.get_plan(tuple(data))
+        return plan(tuple(data.values()))
 
     def normalize_units(self, name, val):
         """
             Return supply of a unit
         """
-        if name in self.supply_data.index:
-            val *= self.supply_data.loc[name, "supply"]
+        supply = self.catalog.supply.get(name)
+        if supply is not None:
+            val *= supply
         return (name, val)
 
     def transform(self, data):
@@ -265,6 +444,43 @@ class NormalizeColumns:
         return data
 
 
+class FilterPlan:
+    """
+        Compiled `NormalizeColumns` filter: gathers the selected
+        positions of a row and multiplies them by the units' supply.
+    """
+    def __init__(self, positions, names, multipliers) -> None:
+        """
+            Args:
+                positions: list[int] - source column positions
+                names: list[str] - output names
+                multipliers: list[float | None] - supply or None
+        """
+        self.positions = positions
+        self.names = names
+        self.multipliers = multipliers
+        if len(positions) == 1:
+            position = positions[0]
+            self._getter = lambda row: (row[position],)
+        elif positions:
+            self._getter = itemgetter(*positions)
+        else:
+            self._getter = lambda row: ()
+
+    def __call__(self, values):
+        """
+            Args:
+                values: Sequence - row values
+            Returns:
+                data: dict - filtered and normalized values
+        """
+        values = self._getter(values)
+        return {
+            name: val * mult if mult is not None else val
+            for name, val, mult in zip(self.names, values, self.multipliers)
+        }
+
+
 class CalcWinprob:
     def __init__(self, delay=5) -> None:
         """
@@ -293,6 +509,24 @@ class CalcWinprob:
         arg = is_win * (final_tick / end_tick) * self.delay
         return 1 / (1 + exp(-arg))
 
+    def transform_batch(self, final_ticks, is_win, end_tick):
+        """
+            Calculates sigmoid for many final ticks at once
+
+            Args:
+                final_ticks: Sequence[int] - Final ticks of the samples.
+                is_win: bool | Sequence[bool] - Whether or not the team won.
+                end_tick: int | Sequence[int] - Ending tick of the game.
+
+            Returns:
+                np.ndarray: Probabilities that the player will win.
+        """
+        final_ticks = np.asarray(final_ticks, dtype=np.float64)
+        is_win = np.asarray(is_win, dtype=np.float64)
+        end_tick = np.asarray(end_tick, dtype=np.float64)
+        arg = is_win * (final_ticks / end_tick) * self.delay
+        return 1 / (1 + np.exp(-arg))
+
 
 class DensityVals:
     """
@@ -303,12 +537,14 @@ class DensityVals:
         supply_data_file,
         reducer="avg",
     ) -> None:
-        self.supply_data = pd.read_csv(supply_data_file, index_col="name")
-        self.supply_data = self.supply_data.rename(index=str.lower)
+        self.supply = get_catalog(supply_data_file=supply_data_file).supply_lower
         possible_reducers = ("avg", "softmax")
         if reducer not in possible_reducers:
             raise KeyError(f"Key 'reducer' should be chosen from {possible_reducers}")
         self.reducer_func = self.reducer_funcs(reducer)
+        self.batch_reducer_func = self.batch_reducer_funcs(reducer)
+        # {columns: (is_supply, supply)} used by the batch methods
+        self._weights = {}
 
     def reducer_funcs(self, name):
         reducer_funcs = {
@@ -317,9 +553,26 @@ class DensityVals:
         }
         return reducer_funcs[name]
 
+    def batch_reducer_funcs(self, name):
+        reducer_funcs = {
+            "avg": self._get_avg_batch,
+            "softmax": self._get_softmax_batch,
+        }
+        return reducer_funcs[name]
+
+    def _get_weights(self, columns):
+        columns = tuple(columns)
+        if columns not in self._weights:
+            is_supply = np.array([col in self.supply for col in columns], dtype=bool)
+            supply = np.array(
+                [self.supply.get(col, 0) for col in columns], dtype=np.float64
+            )
+            self._weights[columns] = (is_supply, supply)
+        return self._weights[columns]
+
     def ceil(self, data):
         for key, val in data.items():
-            if key in self.supply_data.index:
+            if key in self.supply:
                 if isinstance(val, int):
                     data[key] = max(val, 0)
                 elif isinstance(val, float):
@@ -341,8 +594,8 @@ class DensityVals:
     def _get_avg_vals(self, data):
         my_sum = 0
         for key, val in data.items():
-            if key in self.supply_data.index:
-                my_sum += val * self.supply_data.loc[key, "supply"]
+            if key in self.supply:
+                my_sum += val * self.supply[key]
         my_sum = max(my_sum, 1.0)
         new_dict = {}
         for key, val in data.items():
@@ -352,7 +605,7 @@ class DensityVals:
     def _get_softmax_vals(self, data):
         my_sum = 0
         for key, val in data.items():
-            if key in self.supply_data.index:
+            if key in self.supply:
                 my_sum += exp(val)
         my_sum = my_sum if my_sum else 1
         new_dict = {}
@@ -371,56 +624,190 @@ class DensityVals:
         new_dict = self.reducer_func(data)
         return new_dict
 
+    def ceil_batch(self, columns, values):
+        """
+            `ceil` for a (samples, columns) array
+        """
+        is_supply, _ = self._get_weights(columns)
+        values = np.array(values, dtype=np.float64)
+        values[:, is_supply] = np.maximum(values[:, is_supply], 0.0)
+        return values
+
+    def _get_avg_batch(self, columns, values):
+        is_supply, supply = self._get_weights(columns)
+        my_sum = np.zeros(len(values), dtype=np.float64)
+        # Summed column by column in the order of `_get_avg_vals`
+        for pos in np.flatnonzero(is_supply):
+            my_sum += values[:, pos] * supply[pos]
+        my_sum = np.maximum(my_sum, 1.0)
+        return np.minimum(values / my_sum[:, None], 1.0)
+
+    def _get_softmax_batch(self, columns, values):
+        is_supply, _ = self._get_weights(columns)
+        if not is_supply.any():
+            return np.exp(values)
+        # Shifted by the row maximum to avoid overflow
+        shift = values[:, is_supply].max(axis=1, keepdims=True)
+        exp_vals = np.exp(values - shift)
+        return exp_vals / exp_vals[:, is_supply].sum(axis=1, keepdims=True)
+
+    def transform_diff_batch(self, columns, start_values, end_values):
+        """
+            `transform_diff` for (samples, columns) arrays
+            Args:
+                columns: Sequence[str] - column names
+                start_values: np.ndarray - values at the starting points
+                end_values: np.ndarray - values at the end points
+            Returns:
+                values: np.ndarray - float64 array
+        """
+        diff = np.asarray(end_values, dtype=np.float64) - np.asarray(
+            start_values, dtype=np.float64
+        )
+        diff = self.ceil_batch(columns, diff)
+        return self.batch_reducer_func(columns, diff)
+
+    def transform_single_batch(self, columns, values):
+        """
+            `transform_single` for a (samples, columns) array
+            Args:
+                columns: Sequence[str] - column names
+                values: np.ndarray - values of the samples
+            Returns:
+                values: np.ndarray - float64 array
+        """
+        values = self.ceil_batch(columns, values)
+        return self.batch_reducer_func(columns, values)
+
 
 class Extractor:
     """
-        Extracts data from a tables with a preprocessed values
+        Extracts data from a tables with a preprocessed values.
+        `game_info_db` and `build_order_db` can be the DB tables
+        or the readers of a `storage.LocalStorage`.
     """
+    key_columns = ("game_id", "tick")
+
     def __init__(self, game_info_db, build_order_db, ticks_per_second) -> None:
         self.game_info_db = game_info_db
         self.build_order_db = build_order_db
         self.ticks_per_second = ticks_per_second
+        # build_order columns to select, all columns if None
+        self.columns = None
+
+    def select_columns(self, columns):
+        """
+            Limits build_order reads to the columns,
+            `game_id` and `tick` are always selected
+            Args:
+                columns: Sequence[str] | None - build_order columns,
+                    select all columns if None
+        """
+        if columns is None:
+            self.columns = None
+            return
+        extra = [col for col in columns if col not in self.key_columns]
+        self.columns = [*self.key_columns, *dict.fromkeys(extra)]
 
     def extract_ids(self):
-        ids = []
         with self.game_info_db as db:
-            ids = [row[0] for row in db.get()]
+            ids = list(db.iter_ids())
         return ids
 
+    def _players_data(self, players_info):
+        end_seconds, p1r, p1w, p1l, p2r, p2w, p2l = players_info
+        return {
+            "end_tick": end_seconds * self.ticks_per_second,
+            "player_1": {
+                "is_win": p1w if p1w is not None else False,
+                "race": p1r,
+                "league": p1l,
+            },
+            "player_2": {
+                "is_win": p2w if p2w is not None else False,
+                "race": p2r,
+                "league": p2l,
+            },
+        }
+
     def extract_data(self, game_id):
         with self.game_info_db as db:
             out = db.get_players_info(game_id)
-            end_seconds, p1r, p1w, p1l, p2r, p2w, p2l = out
-            data = {
-                "end_tick": end_seconds * self.ticks_per_second,
-                "player_1": {
-                    "is_win": p1w if p1w is not None else False,
-                    "race": p1r,
-                    "league": p1l,
-                },
-                "player_2": {
-                    "is_win": p2w if p2w is not None else False,
-                    "race": p2r,
-                    "league": p2l,
-                },
-            }
-        return data
+        return self._players_data(out)
+
+    def extract_candidates(self, organize, game_ids=None):
+        """
+            Extracts games which may pass ReorganizePlayers filters
+            together with their players data in one streamed query
+            Args:
+                organize: ReorganizePlayers - configured filter
+                game_ids: list[int] | None - check these games only
+            Yields:
+                game: tuple[int, dict] - (game_id, data), where
+                    data is the same as `extract_data` output
+        """
+        with self.game_info_db as db:
+            for row in db.iter_candidates(
+                organize.player,
+                organize.enemy,
+                organize.min_league,
+                organize.include_unranked,
+                game_ids,
+            ):
+                yield (row[0], self._players_data(row[1:]))
 
     def extract_build_order(self, game_id, ticks):
-        return_dicts = []
+        """
+            Returns build order of the game at the ticks using one query
+            Args:
+                game_id: int - game id
+                ticks: list[int] - game ticks, can repeat
+            Returns:
+                return_dicts: list[dict] - rows in the order of `ticks`
+        """
+        if not ticks:
+            return []
         with self.build_order_db as db:
-            for tick in ticks:
-                try:
-                    return_dicts.append(dict(db.get_by_keys(game_id, tick)))
-                except TypeError as exc:
-                    msg = f"Data not found for inputs game_id={game_id}, tick={tick} (out of {ticks})"
-                    print(msg)
-                    msg = "Consider cleaning the db"
-                    print(msg)
-                    raise TypeError from exc
+            rows = db.get_by_ticks(game_id, ticks, self.columns)
+        by_tick = {row["tick"]: row for row in rows}
+        return_dicts = []
+        for tick in ticks:
+            try:
+                return_dicts.append(dict(by_tick[tick]))
+            except KeyError as exc:
+                msg = f"Data not found for inputs game_id={game_id}, tick={tick} (out of {ticks})"
+                print(msg)
+                msg = "Consider cleaning the db"
+                print(msg)
+                raise TypeError from exc
 
         return return_dicts
 
+    def extract_build_order_block(self, requests):
+        """
+            Returns build order of many games using one query
+            Args:
+                requests: dict[int, list[int]] - {game_id: ticks}
+            Returns:
+                rows: dict[tuple[int, int], dict] - {(game_id, tick): row}
+        """
+        keys = list(
+            {(game_id, tick) for game_id, ticks in requests.items() for tick in ticks}
+        )
+        if not keys:
+            return {}
+        with self.build_order_db as db:
+            out = db.get_by_game_ticks(keys, self.columns)
+        rows = {(row["game_id"], row["tick"]): dict(row) for row in out}
+        missing = [key for key in keys if key not in rows]
+        if missing:
+            msg = f"Data not found for inputs (game_id, tick)={missing[:5]} ..."
+            print(msg)
+            msg = "Consider cleaning the db"
+            print(msg)
+            raise TypeError(msg)
+        return rows
+
 
 class Loader:
     """
@@ -430,8 +817,24 @@ class Loader:
     possible_table_types = set(("comp", "winprob", "enemycomp"))
 
     def __init__(
-        self, secrets_path, db_config_path, player_r, enemy_r, table_type
+        self,
+        secrets_path,
+        db_config_path,
+        player_r,
+        enemy_r,
+        table_type,
+        batch_size=None,
     ) -> None:
+        """
+            Args:
+                secrets_path: str - path to secrets file
+                db_config_path: str - path to db config
+                player_r: str - player's game race
+                enemy_r: str - enemy's game race
+                table_type: str - ['comp', 'winprob', 'enemycomp']
+                batch_size: int | None - buffered rows per flush,
+                    defaults to `copy_batch_size` from the db config
+        """
         assert player_r in self.possible_r
         assert enemy_r in self.possible_r
         assert table_type in self.possible_table_types
@@ -444,6 +847,11 @@ class Loader:
 
         self.db = MatchupDB(self.table_name, self.secrets_path, self.db_config_path)
         self.db_accessed = False
+        self.existing_keys = set()
+        self.existing_games = set()
+        self.batch_size = batch_size or self.db.batch_size
+        self.columns = None
+        self._buffer = []
 
     def _format_entity_dict(self, entity_dict, prefix="p"):
         entity_dict = entity_dict.copy()
@@ -461,28 +869,38 @@ class Loader:
         out_entities = self._format_entity_dict(out_entities, "out")
         return player_entities, enemy_entities, out_entities
 
-    def prepare(self):
+    def prepare(self, game_ids=None):
+        """
+            Selects the table and loads its keys
+            Args:
+                game_ids: list[int] | None - load keys of these games only
+        """
         self.db.change_table(self.table_name)
+        self.preload_keys(game_ids)
 
-    def check_if_game_exists(self, game_id):
+    def preload_keys(self, game_ids=None):
+        """
+            Loads (game_id, tick) keys of the table in one query,
+            `check_if_*` methods use them instead of querying the DB.
+            Args:
+                game_ids: list[int] | None - load keys of these games only
+        """
         with self.db as db:
             try:
-                out = db.get_id(game_id)
+                out = db.get_keys(game_ids)
             except AttributeError:
-                return False
+                out = []
             except ProgrammingError:
-                return False
-            return bool(out)
+                # The table isn't created yet
+                out = []
+        self.existing_keys = {(game_id, tick) for game_id, tick in out}
+        self.existing_games = {game_id for game_id, _ in self.existing_keys}
+
+    def check_if_game_exists(self, game_id):
+        return game_id in self.existing_games
 
     def check_if_tick_exists(self, game_id, tick):
-        with self.db as db:
-            try:
-                out = db.get_by_key(game_id, tick)
-            except AttributeError:
-                return False
-            except ProgrammingError:
-                return False
-            return bool(out)
+        return (game_id, tick) in self.existing_keys
 
     def upload_data(
         self,
@@ -492,13 +910,46 @@ class Loader:
         enemy_entities: dict,
         out_entities: dict,
     ):
+        if (game_id, tick) in self.existing_keys:
+            # Already in the table or in the buffer
+            return
         player_entities, enemy_entities, out_entities = self._get_formatted_dicts(
             player_entities, enemy_entities, out_entities
         )
 
-        with self.db as db:
-            if not self.db_accessed:
+        if not self.db_accessed:
+            with self.db as db:
                 self.db.change_table(self.table_name)
                 db.create_table(player_entities, enemy_entities, out_entities)
-                self.db_accessed = True
-            db.put(game_id, tick, player_entities, enemy_entities, out_entities)
+            self.db_accessed = True
+        if self.columns is None:
+            # Column order is fixed by the first row
+            self.columns = ["game_id", "tick"] + list(
+                (player_entities | enemy_entities | out_entities).keys()
+            )
+        entities = player_entities | enemy_entities | out_entities
+        self._buffer.append(
+            [game_id, tick] + [entities.get(col) for col in self.columns[2:]]
+        )
+        self.existing_keys.add((game_id, tick))
+        self.existing_games.add(game_id)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+            Writes buffered rows into the table using `COPY`
+        """
+        if not self._buffer:
+            return
+        # MatchupDB is shared between the loaders
+        self.db.change_table(self.table_name)
+        with self.db as db:
+            db.put_many(self.columns, self._buffer, self.batch_size)
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()